@@ -0,0 +1,65 @@
+import json
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # optional: faster JSON encoding when installed
+    orjson = None
+
+from api.load_model import N_FEATURES
+
+JSON = "application/json"
+OCTET_STREAM = "application/octet-stream"
+DTYPES = {"float64": np.dtype("<f8"), "float32": np.dtype("<f4")}
+
+
+class CodecError(ValueError):
+    pass
+
+
+def decode_rows(body: bytes, content_type: str, dtype: str = "float64") -> np.ndarray:
+    """
+    Decode a positional request body into a (k, N_FEATURES) float array.
+
+    - application/octet-stream: k * N_FEATURES little-endian floats
+      (`dtype` float64 or float32), read in place with no copy
+    - application/json: one row `[f1, ..., f8]` or a list of rows
+    """
+    content_type = (content_type or JSON).split(";")[0].strip().lower()
+    if content_type == OCTET_STREAM:
+        if dtype not in DTYPES:
+            raise CodecError(f"unsupported dtype {dtype!r}; use one of {sorted(DTYPES)}")
+        item = DTYPES[dtype]
+        if not body or len(body) % (item.itemsize * N_FEATURES):
+            raise CodecError(f"body must hold a multiple of {N_FEATURES} {dtype} values")
+        rows = np.frombuffer(body, dtype=item).reshape(-1, N_FEATURES)
+    elif content_type == JSON:
+        try:
+            values = orjson.loads(body) if orjson is not None else json.loads(body)
+            rows = np.array(values, dtype=np.float64)
+        except (ValueError, TypeError) as exc:
+            raise CodecError(f"invalid JSON body: {exc}") from exc
+        if rows.ndim == 1:
+            rows = rows.reshape(1, -1)
+        if rows.ndim != 2 or rows.shape[1] != N_FEATURES or not len(rows):
+            raise CodecError(f"expected a row or a list of rows of {N_FEATURES} numbers")
+    else:
+        raise CodecError(f"unsupported content type {content_type!r}")
+
+    if not np.isfinite(rows).all():
+        raise CodecError("features must be finite numbers")
+    return rows
+
+
+def encode_json(payload) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+def encode_predictions(predictions: np.ndarray) -> bytes:
+    """
+    Predictions as little-endian float64 bytes, one value per row.
+    """
+    return np.ascontiguousarray(predictions, dtype="<f8").tobytes()
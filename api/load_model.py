@@ -1,17 +1,455 @@
-import joblib
-from functools import lru_cache
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor
 from pathlib import Path
 
+import json
+
+import joblib
+import numpy as np
+
+from api.tree_engine import CompiledForest, verify_compiled
+
 ROOT_DIR  = Path(__file__).resolve().parent.parent 
 
-MODEL_PATH = ROOT_DIR / "models/model_v1.pkl"
+MODELS_DIR = ROOT_DIR / "models"
+METADATA_PATH = MODELS_DIR / "metadata.json"
+DEFAULT_VERSION = "v1"
+
+
+def model_path(version: str) -> Path:
+    return MODELS_DIR / f"model_{version}.pkl"
+
+
+MODEL_PATH = model_path(DEFAULT_VERSION)
+
+N_FEATURES = 8
+
+# "compiled" serves forests through api.tree_engine.CompiledForest (checked
+# bit-equal to sklearn at load time); "sklearn" keeps the plain model.
+TREE_ENGINE = os.getenv("STREAMMONITOR_TREE_ENGINE", "compiled")
+
+
+def rss_bytes():
+    """
+    Current resident set size of this process, or None where /proc is
+    missing (macOS, Windows).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, AttributeError, ValueError):
+        return None
+
+
+def peak_rss_bytes():
+    """
+    Peak resident set size of this process, or None on Windows.
+    """
+    try:
+        import resource  # POSIX only
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and KiB on Linux.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _mb(n_bytes):
+    return None if n_bytes is None else n_bytes / 2**20
+
+
+class ModelStore:
+    """
+    Loads the model once, optionally in the background.
+
+    The pickle is written uncompressed by models/train.py, so joblib can
+    memory-map its arrays (mmap_mode="r") instead of reading them into
+    private memory. start() loads on a daemon thread so the app can answer
+    /health while the model warms up; get() waits until it is ready.
+
+    With engine="compiled" a tree forest is flattened into a CompiledForest
+    after loading, and only served if it matches sklearn's predictions bit
+    for bit on split-boundary rows.
+    """
+
+    def __init__(self, path, mmap_mode="r", engine=TREE_ENGINE):
+        self.path = Path(path)
+        self.mmap_mode = mmap_mode
+        self.engine = engine
+
+        self._model = None
+        self._error = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+        self.load_seconds = None
+        self.compile_seconds = None
+        self.warmup_seconds = None
+        self.rss_delta_bytes = None
+        self.engine_used = None
+
+    @property
+    def ready(self) -> bool:
+        # _ready is also set after a failed load, so get() can wake up.
+        return self._ready.is_set() and self._error is None
+
+    @property
+    def state(self) -> str:
+        if not self._ready.is_set():
+            return "loading"
+        return "failed" if self._error is not None else "ready"
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._load, name="model-loader", daemon=True)
+                self._thread.start()
+
+    def get(self, timeout=None):
+        """
+        Return the loaded model, starting the load if needed and waiting for it.
+        """
+        self.start()
+        if not self._ready.wait(timeout):
+            raise TimeoutError(f"model {self.path.name} not loaded after {timeout}s")
+        if self._error is not None:
+            raise RuntimeError(f"failed to load model {self.path}") from self._error
+        return self._model
+
+    def _load(self):
+        try:
+            rss_before = rss_bytes()
+            start = time.perf_counter()
+            model = joblib.load(self.path, mmap_mode=self.mmap_mode)
+            self.load_seconds = time.perf_counter() - start
+
+            self.engine_used = "sklearn"
+            if self.engine == "compiled" and hasattr(model, "estimators_"):
+                start = time.perf_counter()
+                model = self._compile(model)
+                self.compile_seconds = time.perf_counter() - start
+
+            # First predict pays one-off costs (validation, thread pools).
+            start = time.perf_counter()
+            model.predict(np.zeros((1, N_FEATURES)))
+            self.warmup_seconds = time.perf_counter() - start
+
+            rss_after = rss_bytes()
+            if rss_before is not None and rss_after is not None:
+                self.rss_delta_bytes = rss_after - rss_before
+            self._model = model
+        except Exception as exc:
+            self._error = exc
+            print(f"Model load failed: {exc}")
+        finally:
+            self._ready.set()
+
+    def _compile(self, forest):
+        try:
+            compiled = CompiledForest(forest)
+        except (AttributeError, ValueError) as exc:
+            print(f"Tree engine not used for {self.path.name}: {exc}")
+            return forest
+        if not verify_compiled(compiled, forest):
+            print(f"Tree engine not used for {self.path.name}: predictions differ from sklearn")
+            return forest
+        self.engine_used = "compiled"
+        return compiled
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path.name,
+            "ready": self.ready,
+            "state": self.state,
+            "error": None if self._error is None else str(self._error),
+            "engine": self.engine_used,
+            "load_seconds": self.load_seconds,
+            "compile_seconds": self.compile_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "rss_mb": _mb(rss_bytes()),
+            "peak_rss_mb": _mb(peak_rss_bytes()),
+            "model_rss_delta_mb": _mb(self.rss_delta_bytes),
+        }
+
+
+class ModelRegistry:
+    """
+    Versioned models (models/model_<version>.pkl) with hot swapping.
+
+    preload() loads a version in the background; activate() waits for it
+    and then swaps the active version under a lock. Requests take the
+    (version, model) pair once via active(), so in-flight requests finish
+    on the model they started with while new ones use the new version.
+    """
+
+    def __init__(self, default_version=None):
+        self._stores = {}
+        self._lock = threading.Lock()
+        self._active_version = default_version or self._metadata_version()
+
+    @staticmethod
+    def _metadata_version() -> str:
+        try:
+            with open(METADATA_PATH) as f:
+                return json.load(f).get("version", DEFAULT_VERSION)
+        except (OSError, ValueError):
+            return DEFAULT_VERSION
+
+    @staticmethod
+    def available_versions() -> list:
+        return sorted(p.stem.removeprefix("model_") for p in MODELS_DIR.glob("model_*.pkl"))
+
+    @property
+    def active_version(self) -> str:
+        return self._active_version
+
+    @property
+    def ready(self) -> bool:
+        try:
+            return self._store(self._active_version).ready
+        except FileNotFoundError:
+            return False
+
+    def _store(self, version) -> ModelStore:
+        with self._lock:
+            store = self._stores.get(version)
+            if store is None:
+                path = model_path(version)
+                if not path.exists():
+                    raise FileNotFoundError(f"no model file for version {version!r} at {path}")
+                store = self._stores[version] = ModelStore(path)
+            return store
+
+    def start(self):
+        """
+        Begin loading the active version in the background.
+        """
+        self.preload(self._active_version)
+
+    def preload(self, version) -> ModelStore:
+        store = self._store(version)
+        store.start()
+        return store
+
+    def activate(self, version, timeout=None):
+        """
+        Load `version` if needed, then make it the active model. Versions
+        other than the new and previous one are dropped from memory.
+        """
+        self.preload(version).get(timeout)
+        with self._lock:
+            previous = self._active_version
+            self._active_version = version
+            keep = {version, previous}
+            self._stores = {v: s for v, s in self._stores.items() if v in keep}
+        print(f"Active model switched from {previous} to {version}")
+
+    def activate_async(self, version) -> threading.Thread:
+        self._store(version)  # fail fast on unknown versions
+        thread = threading.Thread(target=self.activate, args=(version,), name=f"activate-{version}", daemon=True)
+        thread.start()
+        return thread
+
+    def active(self, timeout=None):
+        """
+        Return (version, model) for the active version.
+        """
+        version = self._active_version
+        return version, self._store(version).get(timeout)
+
+    def get(self, version=None, timeout=None):
+        """
+        Return the model for `version`, activating it first if it is not
+        the active one (used by inference pool processes to follow swaps).
+        """
+        if version is not None and version != self._active_version:
+            self.activate(version, timeout)
+        return self.active(timeout)[1]
+
+    def stats(self) -> dict:
+        with self._lock:
+            stores = dict(self._stores)
+        return {
+            "active_version": self._active_version,
+            "available_versions": self.available_versions(),
+            "loaded": {version: store.stats() for version, store in stores.items()},
+        }
+
+
+registry = ModelRegistry()
 
 
-@lru_cache(maxsize=1)
 def get_model():
     """
-    Load and cache the ML model.
-    This ensures the model is loaded only once.
+    Load and cache the active ML model.
+    This ensures the model is loaded only once; blocks until it is ready.
+    """
+    return registry.active()[1]
+
+
+def _warm_inference_process():
+    get_model()
+
+
+def predict_rows(rows, version=None):
+    """
+    Predict a (n, n_features) array with the cached model of `version`.
+    Module-level so it can run inside a process pool.
+    """
+    return registry.get(version).predict(rows).tolist()
+
+
+def create_inference_executor(max_workers=None) -> ProcessPoolExecutor:
     """
-    model = joblib.load(MODEL_PATH)
-    return model
+    Process pool for CPU-bound inference, so tree traversal is not bound
+    by the GIL of the serving process. Workers are spawned (not forked,
+    the parent runs background threads) and load the model once.
+    """
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_warm_inference_process,
+    )
+
+
+class InferenceScheduler:
+    """
+    Dynamic batching around the active registry model.
+
+    Concurrent single-row predictions are queued and coalesced into one
+    vectorized model.predict call. A batch is dispatched as soon as
+    `max_batch_size` rows are waiting or the oldest row has waited
+    `max_wait_ms`, and each caller gets its own row's result back as a
+    (prediction, model_version) pair.
+
+    Rows submitted while the scheduler is not running, or still queued
+    when it stops, fail with RuntimeError instead of waiting forever.
+    """
+
+    def __init__(self, model=None, max_batch_size=64, max_wait_ms=2.0, timeout_s=30.0):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000
+        self.timeout_s = timeout_s
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._running = False
+        self._lock = threading.Lock()
+
+        self.batches = 0
+        self.rows = 0
+        self.max_queue_depth = 0
+        self.batch_sizes = Counter()
+
+    # ---------- LIFECYCLE ----------
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="inference-scheduler", daemon=True)
+            self._thread.start()
+            self._running = True
+
+    def stop(self, timeout=None):
+        with self._lock:
+            if self._thread is None:
+                return
+            self._running = False
+            self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+        # Anything the loop did not reach before stopping.
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].set_exception(RuntimeError("inference scheduler stopped"))
+
+    # ---------- CALLER SIDE ----------
+    def submit(self, row) -> Future:
+        """
+        Queue one feature row and return a Future for its
+        (prediction, model_version).
+        """
+        future = Future()
+        row = np.asarray(row, dtype=np.float64).reshape(-1)
+        with self._lock:
+            if not self._running:
+                future.set_exception(RuntimeError("inference scheduler is not running"))
+                return future
+            self._queue.put((row, future))
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return future
+
+    def predict(self, row, timeout=None) -> tuple:
+        """
+        Blocking submit(); raises TimeoutError after `timeout` seconds
+        (default `timeout_s`).
+        """
+        return self.submit(row).result(self.timeout_s if timeout is None else timeout)
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_size": self.rows / self.batches if self.batches else 0.0,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+        }
+
+    # ---------- SCHEDULER LOOP ----------
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait_s
+            stopping = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._dispatch(batch)
+            if stopping:
+                return
+
+    def _dispatch(self, batch):
+        rows = np.vstack([row for row, _ in batch])
+        try:
+            if self.model is not None:
+                version, model = None, self.model
+            else:
+                version, model = registry.active()
+            predictions = model.predict(rows)
+        except Exception as exc:
+            for _, future in batch:
+                future.set_exception(exc)
+            return
+
+        for (_, future), prediction in zip(batch, predictions.tolist()):
+            future.set_result((prediction, version))
+
+        self.batches += 1
+        self.rows += len(batch)
+        self.batch_sizes[len(batch)] += 1
@@ -1,35 +1,462 @@
+import asyncio
+import concurrent.futures
+import math
+import os
+import time
 import numpy as np
+from contextlib import asynccontextmanager
 from datetime import datetime,timezone
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 
-from api.schemas import PredictionRequest, PredictionResponse
-from api.load_model import get_model
+from api.schemas import (
+    BatchPredictionRequest,
+    BatchPredictionResponse,
+    PredictionRequest,
+    PredictionResponse,
+)
+from api.codec import OCTET_STREAM, CodecError, decode_rows, encode_json, encode_predictions
+from api.prediction_cache import PredictionCache
+from api.load_model import (
+    InferenceScheduler,
+    create_inference_executor,
+    predict_rows,
+    registry,
+)
+from monitoring.archive import ARCHIVE_AFTER_SECONDS, PredictionArchiver
 from monitoring.processor import MetricsProcessor
+from monitoring.worker import MonitoringWorker
 
 
-app = FastAPI(title="StreamMonitor API")
-model = get_model()
+# Opt-in dynamic batching of concurrent /predict calls.
+scheduler = None
+if os.getenv("STREAMMONITOR_MICROBATCH", "0") == "1":
+    scheduler = InferenceScheduler(
+        max_batch_size=int(os.getenv("STREAMMONITOR_MAX_BATCH_SIZE", "64")),
+        max_wait_ms=float(os.getenv("STREAMMONITOR_MAX_WAIT_MS", "2"))
+    )
+
+# Opt-in result cache and request_id replay dedup.
+prediction_cache = None
+if os.getenv("STREAMMONITOR_PREDICTION_CACHE", "0") == "1":
+    prediction_cache = PredictionCache(
+        max_entries=int(os.getenv("STREAMMONITOR_CACHE_MAX_ENTRIES", "100000")),
+        ttl_seconds=float(os.getenv("STREAMMONITOR_CACHE_TTL_S", "300"))
+    )
+
+# Longest a duplicate request_id waits for the original request's response.
+REPLAY_WAIT_S = 30.0
+
+# Share one drift window between all uvicorn workers on this host.
+SHARED_WINDOW = os.getenv("STREAMMONITOR_SHARED_WINDOW", "0") == "1"
+
+m_processor  = MetricsProcessor(drift_threshold=0.3,global_threshold=0.3,shared_window=SHARED_WINDOW)
+m_worker = MonitoringWorker(
+    m_processor,
+    max_queue=10000,
+    drift_every_n=100,
+    drift_every_ms=1000,
+    drop_policy="drop_oldest"
+)
+
+# Opt-in: move aged predictions from SQLite to hourly Parquet files.
+archiver = None
+if os.getenv("STREAMMONITOR_ARCHIVE", "0") == "1":
+    archiver = PredictionArchiver(
+        age_seconds=float(os.getenv("STREAMMONITOR_ARCHIVE_AFTER_S", str(ARCHIVE_AFTER_SECONDS))),
+        interval=float(os.getenv("STREAMMONITOR_ARCHIVE_INTERVAL_S", "600"))
+    )
+
+# Process pool used by the async endpoint, created with the app.
+# Every uvicorn worker creates its own pool, so the default splits the CPUs
+# between them: uvicorn reads --workers from WEB_CONCURRENCY, but a plain
+# `--workers N` is not visible here, so with N > 1 set WEB_CONCURRENCY=N
+# or STREAMMONITOR_INFERENCE_WORKERS explicitly. Capped at 4 per worker.
+UVICORN_WORKERS = max(int(os.getenv("WEB_CONCURRENCY", "1")), 1)
+INFERENCE_WORKERS = int(os.getenv("STREAMMONITOR_INFERENCE_WORKERS", "0")) or min(
+    max((os.cpu_count() or 1) // UVICORN_WORKERS, 1), 4
+)
+inference_executor = None
 
-m_processor  = MetricsProcessor(drift_threshold=0.3,global_threshold=0.3)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global inference_executor
+    registry.start()
+    m_worker.start()
+    if scheduler is not None:
+        scheduler.start()
+    if archiver is not None:
+        archiver.start()
+    inference_executor = create_inference_executor(INFERENCE_WORKERS)
+    yield
+    if archiver is not None:
+        archiver.stop()
+    inference_executor.shutdown(wait=True, cancel_futures=True)
+    if scheduler is not None:
+        scheduler.stop()
+    m_worker.stop()
+    m_processor.close()
+
+
+app = FastAPI(title="StreamMonitor API", lifespan=lifespan)
+
+
+@app.exception_handler(RequestValidationError)
+async def validation_error(request: Request, exc: RequestValidationError):
+    # The default handler echoes each rejected input back, and a NaN or
+    # inf feature cannot be encoded as JSON; send those as strings.
+    errors = [
+        {**error, "input": repr(error["input"])}
+        if isinstance(error.get("input"), float) and not math.isfinite(error["input"])
+        else error
+        for error in exc.errors()
+    ]
+    return JSONResponse(status_code=422, content={"detail": jsonable_encoder(errors)})
 
 @app.get("/health")
 def health_check():
-    return {"status": "ok"}
+    return {"status": "ok", "model_ready": registry.ready, "model_version": registry.active_version}
+
+
+@app.get("/models")
+def list_models():
+    return registry.stats()
+
+
+@app.post("/models/{version}/preload")
+def preload_model(version: str):
+    try:
+        registry.preload(version)
+    except FileNotFoundError as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+    return {"preloading": version}
+
+
+@app.post("/models/{version}/activate")
+def activate_model(version: str):
+    try:
+        registry.activate_async(version)
+    except FileNotFoundError as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+    return {"activating": version, "active_version": registry.active_version}
+
+
+@app.get("/monitoring/stats")
+def monitoring_stats():
+    stats = m_worker.stats()
+    stats["archive"] = None if archiver is None else archiver.stats()
+    return stats
+
+
+@app.get("/monitoring/drift")
+def horizon_drift(hours: float | None = None):
+    seconds = None if hours is None else hours * 3600
+    result = m_processor.horizon_drift(seconds)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Not enough traffic in this horizon")
+    return result
+
+
+@app.get("/monitoring/sketch")
+def monitoring_sketch(hours: float | None = None):
+    """
+    Merged per-feature t-digests, loadable with FeatureSketches.from_bytes
+    and mergeable with the sketches of other workers.
+    """
+    seconds = None if hours is None else hours * 3600
+    return Response(m_processor.sketch_bytes(seconds), media_type="application/octet-stream")
+
+
+@app.get("/inference/stats")
+def inference_stats():
+    stats = {"microbatching": scheduler is not None}
+    if scheduler is not None:
+        stats.update(scheduler.stats())
+    stats["prediction_cache"] = None if prediction_cache is None else prediction_cache.stats()
+    return stats
+
+
+def cached_prediction(data_array):
+    """
+    (prediction, version) from the result cache; prediction is None on a miss
+    or when caching is off.
+    """
+    if prediction_cache is None:
+        return None, None
+    version = registry.active_version
+    return prediction_cache.get(data_array, version), version
+
+
+def predict_rows_cached(rows):
+    """
+    (predictions, version) for a (k, n_features) array: rows in the result
+    cache are served from it, the rest in one model.predict call.
+    """
+    version, model = registry.active()
+    predictions = [None] * len(rows)
+    if prediction_cache is not None:
+        predictions = [prediction_cache.get(row, version) for row in rows]
+    misses = [i for i, p in enumerate(predictions) if p is None]
+    if misses:
+        for i, p in zip(misses, model.predict(rows[misses]).tolist()):
+            predictions[i] = p
+            if prediction_cache is not None:
+                prediction_cache.put(rows[i], version, p)
+    return predictions, version
+
+
+def predict_row(row):
+    version, model = registry.active()
+    return float(model.predict(row.reshape(1, -1))[0]), version
+
+
+def reserve(request_id, rows):
+    """
+    None if this request owns `request_id` and must be served (then call
+    remember() or forget()), else a Future of the response already sent
+    for it. 409 if the id was used with different features.
+    """
+    if prediction_cache is None:
+        return None
+    status, future = prediction_cache.reserve(request_id, rows)
+    if status == "conflict":
+        raise HTTPException(
+            status_code=409, detail=f"request_id {request_id!r} was already used with different features"
+        )
+    return future if status == "replay" else None
+
+
+def remember(request_id, data_array, prediction, version, response):
+    if prediction_cache is not None:
+        prediction_cache.put(data_array, version, prediction)
+        prediction_cache.complete(request_id, response)
+
+
+def forget(request_id, exc):
+    if prediction_cache is not None:
+        prediction_cache.release(request_id, exc)
+
+
+def replay_result(pending):
+    try:
+        return pending.result(timeout=REPLAY_WAIT_S)
+    except concurrent.futures.TimeoutError:
+        raise HTTPException(status_code=504, detail="timed out waiting for the original request")
+
+
+async def replay_result_async(pending):
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(pending), REPLAY_WAIT_S)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="timed out waiting for the original request")
+
+
+@app.post("/predict/batch", response_model=BatchPredictionResponse)
+def predict_batch(batch: BatchPredictionRequest):
+    features = [item.model_dump(exclude={"request_id"}) for item in batch.items]
+    data_array = np.array([list(f.values()) for f in features])
+
+    pending = []
+    owned = []
+    try:
+        for i, (item, row) in enumerate(zip(batch.items, data_array)):
+            pending.append(reserve(item.request_id, row))
+            if pending[-1] is None:
+                owned.append(i)
+
+        predictions = []
+        if owned:
+            predictions, version = predict_rows_cached(data_array[owned])
+            m_worker.submit_batch([features[i] for i in owned],predictions,
+                                  [batch.items[i].request_id for i in owned],version)
+    except BaseException as exc:
+        for i in owned:
+            forget(batch.items[i].request_id, exc)
+        raise
+
+    responses = [None] * len(batch.items)
+    timestamp = datetime.now(timezone.utc).isoformat()
+    for i, prediction in zip(owned, predictions):
+        request_id = batch.items[i].request_id
+        responses[i] = PredictionResponse(
+            prediction=prediction, request_id=request_id, timestamp=timestamp, model_version=version
+        )
+        remember(request_id, data_array[i], prediction, version, responses[i])
+    # Replays last: a request_id repeated inside this batch waits on the
+    # copy served above.
+    for i, future in enumerate(pending):
+        if future is not None:
+            responses[i] = replay_result(future)
+
+    return BatchPredictionResponse(predictions=responses)
 
 
 @app.post("/predict/{request_id}", response_model=PredictionResponse)
 def predict(request_id: str, data_point: PredictionRequest):
     data_dict = data_point.model_dump() 
     data_array = np.array(list(data_dict.values())) 
-    
-    predict = model.predict(data_array.reshape(1, -1)) 
-    m_processor.backend_ops(data_dict,predict[0],request_id)
+    if (pending := reserve(request_id, data_array)) is not None:
+        return replay_result(pending)
+
+    try:
+        prediction, version = cached_prediction(data_array)
+        if prediction is None:
+            if scheduler is not None:
+                prediction, version = scheduler.predict(data_array)
+            else:
+                version, model = registry.active()
+                prediction = model.predict(data_array.reshape(1, -1))[0]
+        m_worker.submit(data_dict,prediction,request_id,version)
+    except BaseException as exc:
+        forget(request_id, exc)
+        raise
 
-    return PredictionResponse(
-        prediction=predict[0],
+    response = PredictionResponse(
+        prediction=prediction,
         request_id=request_id,
-        timestamp = datetime.now(timezone.utc).isoformat()
+        timestamp = datetime.now(timezone.utc).isoformat(),
+        model_version=version
     )
+    remember(request_id, data_array, prediction, version, response)
+    return response
+
+@app.post("/v2/predict/{request_id}", response_model=PredictionResponse)
+async def predict_async(request_id: str, data_point: PredictionRequest):
+    data_dict = data_point.model_dump()
+    data_array = np.array(list(data_dict.values()))
+    if (pending := reserve(request_id, data_array)) is not None:
+        return await replay_result_async(pending)
+
+    try:
+        prediction, version = cached_prediction(data_array)
+        if prediction is None:
+            if scheduler is not None:
+                prediction, version = await asyncio.wrap_future(scheduler.submit(data_array))
+            else:
+                version = registry.active_version
+                loop = asyncio.get_running_loop()
+                predictions = await loop.run_in_executor(
+                    inference_executor, predict_rows, data_array.reshape(1, -1), version
+                )
+                prediction = predictions[0]
+        await m_worker.submit_async(data_dict,prediction,request_id,version)
+    except BaseException as exc:
+        forget(request_id, exc)
+        raise
+
+    response = PredictionResponse(
+        prediction=prediction,
+        request_id=request_id,
+        timestamp = datetime.now(timezone.utc).isoformat(),
+        model_version=version
+    )
+    remember(request_id, data_array, prediction, version, response)
+    return response
+
+# ---------- FAST PATH ----------
+# Positional-array endpoints that skip pydantic models: the body is raw
+# rows of 8 features (JSON arrays, or octet-stream floats with an X-Dtype
+# header of float64 or float32). Responses are compact JSON with unix
+# timestamps, or raw float64 predictions with Accept: application/octet-stream.
+
+async def read_rows(request: Request):
+    try:
+        return decode_rows(
+            await request.body(),
+            request.headers.get("content-type"),
+            request.headers.get("x-dtype", "float64")
+        )
+    except CodecError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+
+
+def fast_response(request: Request, payload, predictions, version):
+    if OCTET_STREAM in request.headers.get("accept", ""):
+        return Response(
+            encode_predictions(predictions),
+            media_type=OCTET_STREAM,
+            headers={"X-Model-Version": str(version)}
+        )
+    return Response(encode_json(payload), media_type="application/json")
+
+
+def replay_fields(response) -> dict:
+    """
+    A single-request replay as a dict: the schema endpoints store a
+    PredictionResponse, the fast path a plain dict.
+    """
+    fields = response if isinstance(response, dict) else response.model_dump(mode="json")
+    if "prediction" not in fields:
+        raise HTTPException(status_code=500, detail="stored replay is not a single prediction")
+    return fields
+
+
+@app.post("/fast/predict/batch/{batch_id}")
+async def predict_fast_batch(batch_id: str, request: Request):
+    """
+    Batch fast path; row i gets request_id "<batch_id>-<i>". Batch ids are
+    deduplicated separately from single request_ids. Rows in the result
+    cache are served from it; the microbatch scheduler is not used, as the
+    rows are already batched.
+    """
+    rows = await read_rows(request)
+    if len(rows) > 10000:
+        raise HTTPException(status_code=422, detail="at most 10000 rows per batch")
+    replay_key = ("batch", batch_id)
+    if (pending := reserve(replay_key, rows)) is not None:
+        replay = await replay_result_async(pending)
+        predictions = [p["prediction"] for p in replay["predictions"]]
+        return fast_response(request, replay, predictions, replay["predictions"][0]["model_version"])
+    request_ids = [f"{batch_id}-{i}" for i in range(len(rows))]
+
+    try:
+        predictions, version = await run_in_threadpool(predict_rows_cached, rows)
+        await m_worker.submit_batch_async(rows,predictions,request_ids,version)
+    except BaseException as exc:
+        forget(replay_key, exc)
+        raise
+
+    timestamp = time.time()
+    payload = {
+        "predictions": [
+            {"prediction": p, "request_id": r, "timestamp": timestamp, "model_version": version}
+            for p, r in zip(predictions, request_ids)
+        ]
+    }
+    if prediction_cache is not None:
+        prediction_cache.complete(replay_key, payload)
+    return fast_response(request, payload, predictions, version)
+
+
+@app.post("/fast/predict/{request_id}")
+async def predict_fast(request_id: str, request: Request):
+    rows = await read_rows(request)
+    if len(rows) != 1:
+        raise HTTPException(status_code=422, detail="expected exactly one row; use /fast/predict/batch")
+    if (pending := reserve(request_id, rows[0])) is not None:
+        fields = replay_fields(await replay_result_async(pending))
+        return fast_response(request, fields, [fields["prediction"]], fields["model_version"])
+
+    try:
+        prediction, version = cached_prediction(rows[0])
+        if prediction is None:
+            if scheduler is not None:
+                prediction, version = await asyncio.wrap_future(scheduler.submit(rows[0]))
+            else:
+                # registry.active() may load a pickle; keep it off the loop.
+                prediction, version = await run_in_threadpool(predict_row, rows[0])
+        await m_worker.submit_batch_async(rows,[prediction],[request_id],version)
+    except BaseException as exc:
+        forget(request_id, exc)
+        raise
+
+    payload = {"prediction": prediction, "request_id": request_id, "timestamp": time.time(), "model_version": version}
+    remember(request_id, rows[0], prediction, version, payload)
+    return fast_response(request, payload, [prediction], version)
 
 if __name__ == "__main__":
     import uvicorn
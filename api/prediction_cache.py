@@ -0,0 +1,164 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class PredictionCache:
+    """
+    Bounded LRU + TTL cache of model outputs, plus a replay log of recent
+    responses by request_id.
+
+    - results are keyed on the model version and the feature vector rounded
+      to `decimals` places, so float noise below that maps to one entry
+    - a new model version clears every cached result
+    - a request_id seen within the TTL is a replay: callers return the
+      original response and skip monitoring, so retries do not count twice
+      in the drift window. The id is reserved atomically by reserve(), so
+      concurrent duplicates wait for the first request instead of being
+      scored twice; an id reused with different features is a conflict
+    """
+
+    def __init__(self, max_entries=100_000, ttl_seconds=300.0, decimals=6, max_replays=100_000):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.decimals = decimals
+        self.max_replays = max_replays
+
+        self._entries = OrderedDict()  # key -> (prediction, expires_at)
+        self._replays = OrderedDict()  # key -> (Future of response, fingerprint, expires_at)
+        self._version = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.replays = 0
+        self.conflicts = 0
+
+    def _key(self, row) -> bytes:
+        # + 0.0 folds -0.0 into 0.0 so both hash the same.
+        return (np.round(np.asarray(row, dtype=np.float64), self.decimals) + 0.0).tobytes()
+
+    def _check_version(self, version):
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+                self._entries.clear()
+            self._version = version
+
+    # ---------- RESULTS ----------
+    def get(self, row, version):
+        """
+        Cached prediction for `row` under `version`, or None.
+        """
+        key = self._key(row)
+        now = time.monotonic()
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] < now:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, row, version, prediction: float):
+        key = self._key(row)
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = (prediction, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    # ---------- REPLAYS ----------
+    def fingerprint(self, rows) -> bytes:
+        return hashlib.blake2b(self._key(rows), digest_size=16).digest()
+
+    def reserve(self, key, rows):
+        """
+        Claim `key` (a request_id, or any hashable) for a request with
+        feature rows `rows`. Returns (status, future):
+        - ("new", future):      the caller computes the response, then calls
+                                complete(key, response) or release(key, exc)
+        - ("replay", future):   the key was seen with the same features; the
+                                future holds (or will hold) the first response
+        - ("conflict", None):   the key was seen with different features
+        """
+        fingerprint = self.fingerprint(rows)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._replays.get(key)
+            # Pending reservations never expire; finished ones after the TTL.
+            if entry is not None and entry[0].done() and entry[2] < now:
+                del self._replays[key]
+                entry = None
+            if entry is None:
+                future = Future()
+                self._replays[key] = (future, fingerprint, float("inf"))
+                self._evict_replays()
+                return "new", future
+            if entry[1] != fingerprint:
+                self.conflicts += 1
+                return "conflict", None
+            self.replays += 1
+            return "replay", entry[0]
+
+    def complete(self, key, response):
+        with self._lock:
+            entry = self._replays.get(key)
+            if entry is not None:
+                self._replays[key] = (entry[0], entry[1], time.monotonic() + self.ttl_seconds)
+        if entry is not None and not entry[0].done():
+            entry[0].set_result(response)
+
+    def release(self, key, exc: BaseException):
+        """
+        Drop a reservation whose request failed; waiting duplicates get `exc`.
+        """
+        with self._lock:
+            entry = self._replays.pop(key, None)
+        if entry is not None and not entry[0].done():
+            entry[0].set_exception(exc)
+
+    def _evict_replays(self):
+        # Oldest finished entries go first; pending ones are still being served.
+        while len(self._replays) > self.max_replays:
+            for key, entry in self._replays.items():
+                if entry[0].done():
+                    del self._replays[key]
+                    break
+            else:
+                return
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "model_version": self._version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "replays": self.replays,
+                "conflicts": self.conflicts,
+                "remembered_requests": len(self._replays),
+            }
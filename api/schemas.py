@@ -1,8 +1,11 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime
 
 
 class PredictionRequest(BaseModel):
+    # NaN / inf would poison the monitoring window's running stats.
+    model_config = ConfigDict(allow_inf_nan=False)
+
     feature1: float
     feature2: float
     feature3: float
@@ -17,3 +20,16 @@ class PredictionResponse(BaseModel):
     prediction: float
     request_id: str
     timestamp: datetime
+    model_version: str | None = None
+
+
+class BatchPredictionItem(PredictionRequest):
+    request_id: str
+
+
+class BatchPredictionRequest(BaseModel):
+    items: list[BatchPredictionItem] = Field(min_length=1, max_length=10000)
+
+
+class BatchPredictionResponse(BaseModel):
+    predictions: list[PredictionResponse]
@@ -0,0 +1,185 @@
+import numpy as np
+
+
+class CompiledForest:
+    """
+    A fitted sklearn RandomForestRegressor / ExtraTreesRegressor (single
+    output) flattened into contiguous node arrays.
+
+    Small batches (the single-row serving path) are evaluated with one
+    vectorized NumPy traversal of all trees at once. Larger batches call
+    each tree's compiled predict directly, skipping the forest's input
+    validation and joblib dispatch. Both paths are bit-equal to sklearn:
+    - inputs are cast to float32 and compared `x <= threshold` against the
+      float64 thresholds, as sklearn's tree code does
+    - NaN goes to the side stored in each node's missing_go_to_left, and
+      infinite (or float32-overflowing) inputs raise ValueError, as
+      forest.predict does
+    - tree outputs are summed in estimator order and then divided by the
+      number of trees, as sklearn's single-threaded accumulation does
+
+    All trees share one global node index space. Leaves point to
+    themselves, so rows that reach a leaf early stay put until the rest
+    of the batch catches up.
+    """
+
+    def __init__(self, forest, batch_threshold=32, check_every=4):
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        if any(tree.n_outputs != 1 for tree in trees):
+            raise ValueError("CompiledForest supports single-output regressors only")
+
+        self.trees = trees
+        self.n_trees = len(trees)
+        self.n_features = forest.n_features_in_
+        self.max_depth = max(tree.max_depth for tree in trees)
+        self.batch_threshold = batch_threshold
+        self.check_every = check_every
+
+        sizes = np.array([tree.node_count for tree in trees])
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        self.roots = offsets.astype(np.intp)
+
+        features, thresholds, children, values, leaves, missing = [], [], [], [], [], []
+        for tree, offset in zip(trees, offsets):
+            own = np.arange(tree.node_count) + offset
+            is_leaf = tree.children_left == -1
+            left = np.where(is_leaf, own, tree.children_left + offset)
+            right = np.where(is_leaf, own, tree.children_right + offset)
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            children.append(np.stack([left, right], axis=1))
+            values.append(tree.value[:, 0, 0])
+            leaves.append(is_leaf)
+            missing.append(np.asarray(tree.missing_go_to_left, dtype=bool))
+
+        self.feature = np.ascontiguousarray(np.concatenate(features), dtype=np.intp)
+        self.threshold = np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64)
+        # children[2 * node + go_right]
+        self.children = np.ascontiguousarray(np.concatenate(children).ravel(), dtype=np.intp)
+        self.value = np.ascontiguousarray(np.concatenate(values), dtype=np.float64)
+        self.is_leaf = np.concatenate(leaves)
+        self.missing_go_to_left = np.concatenate(missing)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.value)
+
+    def _as_float32(self, X) -> np.ndarray:
+        with np.errstate(over="ignore"):
+            X = np.ascontiguousarray(X, dtype=np.float32).reshape(-1, self.n_features)
+        if np.isinf(X).any():
+            raise ValueError("Input X contains infinity or a value too large for dtype('float32').")
+        return X
+
+    def apply(self, X) -> np.ndarray:
+        """
+        Global leaf index of every row in every tree: (n_rows, n_trees).
+        """
+        X = self._as_float32(X)
+        n = len(X)
+        flat_X = X.ravel()
+
+        leaves = np.tile(self.roots, n)
+        row_start = np.repeat(np.arange(n, dtype=np.intp) * self.n_features, self.n_trees)
+
+        # Walk only the (row, tree) paths not yet at a leaf; finished
+        # paths are dropped every `check_every` steps.
+        active = np.flatnonzero(~self.is_leaf[leaves])
+        nodes = leaves[active]
+        row_start = row_start[active]
+        step = 0
+        while len(active):
+            x = flat_X.take(row_start + self.feature.take(nodes))
+            go_right = x > self.threshold.take(nodes)
+            missing = np.isnan(x)
+            if missing.any():
+                go_right[missing] = ~self.missing_go_to_left.take(nodes[missing])
+            nodes = self.children.take(2 * nodes + go_right)
+
+            step += 1
+            if step % self.check_every == 0 or step >= self.max_depth:
+                done = self.is_leaf.take(nodes)
+                leaves[active[done]] = nodes[done]
+                keep = ~done
+                active, nodes, row_start = active[keep], nodes[keep], row_start[keep]
+        return leaves.reshape(n, self.n_trees)
+
+    def predict(self, X) -> np.ndarray:
+        X = self._as_float32(X)
+        if len(X) <= self.batch_threshold:
+            return self.predict_traversal(X)
+        return self.predict_per_tree(X)
+
+    def predict_traversal(self, X) -> np.ndarray:
+        outputs = self.value.take(self.apply(X))
+        # Running sum in tree order (np.sum would add pairwise).
+        return np.cumsum(outputs, axis=1)[:, -1] / self.n_trees
+
+    def predict_per_tree(self, X) -> np.ndarray:
+        X = self._as_float32(X)
+        total = np.zeros(len(X))
+        for tree in self.trees:
+            total += tree.predict(X)[:, 0]
+        return total / self.n_trees
+
+
+def verification_rows(forest, n_random=256, seed=0) -> np.ndarray:
+    """
+    Rows that exercise split boundaries: feature values equal to, and one
+    float32 step either side of, thresholds drawn from the forest. Some
+    rows also get a NaN, +inf or -inf in one feature.
+    """
+    rng = np.random.default_rng(seed)
+    features = np.concatenate([estimator.tree_.feature for estimator in forest.estimators_])
+    thresholds = np.concatenate([estimator.tree_.threshold for estimator in forest.estimators_])
+
+    columns = []
+    for j in range(forest.n_features_in_):
+        values = thresholds[features == j].astype(np.float32)
+        if not len(values):
+            values = np.zeros(1, dtype=np.float32)
+        picked = rng.choice(values, size=n_random)
+        step = rng.integers(-1, 2, size=n_random)
+        with np.errstate(over="ignore"):
+            picked = np.where(step < 0, np.nextafter(picked, np.float32(-np.inf)), picked)
+            picked = np.where(step > 0, np.nextafter(picked, np.float32(np.inf)), picked)
+        columns.append(picked)
+    rows = np.column_stack(columns).astype(np.float64)
+
+    special = rng.choice([np.nan, np.inf, -np.inf], size=n_random, p=[0.5, 0.25, 0.25])
+    which = rng.integers(forest.n_features_in_, size=n_random)
+    hit = rng.random(n_random) < 0.25
+    rows[hit, which[hit]] = special[hit]
+    return rows
+
+
+def _raises_value_error(predict, rows) -> bool:
+    try:
+        predict(rows)
+    except ValueError:
+        return True
+    return False
+
+
+def verify_compiled(compiled, forest, rows=None) -> bool:
+    """
+    True if both compiled paths reproduce forest.predict bit for bit
+    (NaN rows included) and, like it, reject rows with infinite values.
+    """
+    rows = verification_rows(forest) if rows is None else np.asarray(rows, dtype=np.float64)
+    infinite = np.isinf(rows).any(axis=1)
+    finite_rows = rows[~infinite]
+    expected = forest.predict(finite_rows)
+    if not (
+        np.array_equal(compiled.predict_traversal(finite_rows), expected, equal_nan=True)
+        and np.array_equal(compiled.predict_per_tree(finite_rows), expected, equal_nan=True)
+    ):
+        return False
+    if infinite.any():
+        bad = rows[infinite][:1]
+        return all(
+            _raises_value_error(predict, bad)
+            for predict in (forest.predict, compiled.predict_traversal, compiled.predict_per_tree)
+        )
+    return True
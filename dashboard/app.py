@@ -1,14 +1,20 @@
 import sqlite3
+import sys
 import pandas as pd
 import streamlit as st
 import plotly.express as px
-import json
 from datetime import datetime
 from pathlib import Path
 ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))  # `streamlit run` only puts dashboard/ on the path
+from monitoring.charts import MAX_POINTS, downsample, pick_resolution, prediction_histogram
+from monitoring.rollups import load_rollups
 DB_PATH = ROOT_DIR/"monitoring"/"monitoring.db"
 REFRESH_INTERVAL = 40  # seconds
 FEATURES = [f"feature{i}" for i in range(1, 9)]
+DRIFT_STATS = ("mean_drift", "median_drift", "std_drift")
+TREND_RANGES = {"1h": 1, "6h": 6, "24h": 24, "7d": 168, "30d": 720}  # label -> hours
+PREDICTION_WINDOW = 1000  # predictions kept for the distribution chart
 
 # -------------------------------
 # DATABASE CONNECTION
@@ -26,37 +32,90 @@ def get_connection():
     """Return a persistent SQLite connection."""
     return sqlite3.connect(DB_PATH, check_same_thread=False)
 
-@st.cache_data(ttl=REFRESH_INTERVAL)
 def load_predictions():
+    """
+    Last PREDICTION_WINDOW predictions, cached in the session. A refresh
+    only reads rows with an id above the last one seen.
+    """
     conn = get_connection()
-    df = pd.read_sql(
-        "SELECT timestamp, prediction FROM predictions ORDER BY timestamp DESC LIMIT 1000",
+    cached = st.session_state.get("predictions")
+    last_id = 0 if cached is None or cached.empty else int(cached["id"].iloc[-1])
+
+    # Ids restart after scripts/clean_db.py; start over if they went back.
+    max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM predictions").fetchone()[0]
+    if max_id < last_id:
+        cached, last_id = None, 0
+
+    new = pd.read_sql(
+        "SELECT id, timestamp, prediction FROM predictions WHERE id > ? ORDER BY id DESC LIMIT ?",
         conn,
-    )
-    df["timestamp"] = pd.to_datetime(df["timestamp"], unit="s")
+        params=[last_id, PREDICTION_WINDOW],
+    ).iloc[::-1]
+    new["timestamp"] = pd.to_datetime(new["timestamp"], unit="s")
+
+    df = new if cached is None else pd.concat([cached, new], ignore_index=True)
+    df = df.tail(PREDICTION_WINDOW).reset_index(drop=True)
+    st.session_state["predictions"] = df
     return df
 
-@st.cache_data(ttl=REFRESH_INTERVAL)
-def load_metrics():
+def load_metrics(hours: int, resolution: int):
+    """
+    Trend data from the rollups at `resolution`, cached in the session. A
+    refresh re-reads only the last cached bucket (it may have been merged
+    into since) and anything newer, then drops buckets older than `hours`.
+    """
     conn = get_connection()
+    if st.session_state.get("metrics_key") != (hours, resolution):
+        st.session_state["metrics_key"] = (hours, resolution)
+        st.session_state["metrics"] = None
+    cached = st.session_state.get("metrics")
+    window_start = datetime.now().timestamp() - hours * 3600
+    since = window_start
+    if cached is not None and not cached.empty:
+        since = max(since, cached["bucket"].iloc[-1])
+
+    new = load_rollups(conn, resolution, since=since, columns=[
+        "bucket", "median_value_avg", "mean_value_avg", "std_value_avg",
+        "drift_max", "alert_count"
+    ])
+    new = new.rename(columns={
+        "median_value_avg": "median_value",
+        "mean_value_avg": "mean_value",
+        "std_value_avg": "std_value",
+        "drift_max": "drift_score",
+    })
+    new["alert"] = (new["alert_count"] > 0).astype(int)
+    new["timestamp"] = pd.to_datetime(new["bucket"], unit="s")
+
+    if cached is not None:
+        new = pd.concat([cached[cached["bucket"] < since], new], ignore_index=True)
+    df = new[new["bucket"] >= window_start].reset_index(drop=True)
+    st.session_state["metrics"] = df
+    return df
+
+def load_latest_metric():
+    conn = get_connection()
+    columns = [f"{stat}_{feature}" for stat in DRIFT_STATS for feature in FEATURES]
     df = pd.read_sql(
-        """
-        SELECT timestamp, median_value, mean_value, std_value, drift_score, mean_ratio, 
-               median_ratio, std_ratio, alert, mean_drift_vals, median_drift_vals, std_drift_vals
+        f"""
+        SELECT timestamp, drift_score, alert, {", ".join(columns)}
         FROM metrics
-        ORDER BY timestamp ASC
+        ORDER BY timestamp DESC
+        LIMIT 1
         """,
         conn,
     )
     df["timestamp"] = pd.to_datetime(df["timestamp"], unit="s")
-
-    # Parse JSON strings
-    df["mean_drift_vals"] = df["mean_drift_vals"].apply(json.loads)
-    df["median_drift_vals"] = df["median_drift_vals"].apply(json.loads)
-    df["std_drift_vals"] = df["std_drift_vals"].apply(json.loads)
     return df
 
 
+def trend(df, column, method="lttb"):
+    """
+    One column of the trend frame, downsampled to at most MAX_POINTS.
+    """
+    return downsample(df, "bucket", column, MAX_POINTS, method).set_index("timestamp")[column]
+
+
 def get_baseline_median(df):
     return df["median_value"].iloc[0] if not df.empty else None
 
@@ -75,135 +134,134 @@ st.caption("Live prediction monitoring with streaming median, mean, std & drift
 # -------------------------------
 # AUTO REFRESH
 # -------------------------------
-st.markdown(
-    f"""<meta http-equiv="refresh" content="{REFRESH_INTERVAL}">""",
-    unsafe_allow_html=True,
-)
-
-# -------------------------------
-# LOAD DATA
-# -------------------------------
-pred_df = load_predictions()
-metrics_df = load_metrics()
+# Only this fragment re-runs on each refresh: the session (and the cached
+# frames in it) survives, unlike with a full-page <meta refresh>.
+@st.fragment(run_every=REFRESH_INTERVAL)
+def render_dashboard(range_label):
+    hours = TREND_RANGES[range_label]
+    resolution = pick_resolution(hours * 3600)
 
-# -------------------------------
-# TOP ROW: Prediction Distribution & Median Trend
-# -------------------------------
-col1, col2 = st.columns(2)
+    # -------------------------------
+    # LOAD DATA
+    # -------------------------------
+    pred_df = load_predictions()
+    metrics_df = load_metrics(hours, resolution)
+    latest_df = load_latest_metric()
 
-with col1:
-    st.subheader("Prediction Distribution (Last 1000 Predictions)")
-    if not pred_df.empty:
-        # Ensure predictions are numeric
-        pred_df["prediction"] = pd.to_numeric(pred_df["prediction"], errors="coerce")
-        pred_df = pred_df.dropna(subset=["prediction"])  # drop any invalid values
+    # -------------------------------
+    # TOP ROW: Prediction Distribution & Median Trend
+    # -------------------------------
+    col1, col2 = st.columns(2)
 
+    with col1:
+        st.subheader("Prediction Distribution (Last 1000 Predictions)")
         if not pred_df.empty:
-            hist = pd.cut(pred_df["prediction"], bins=20).value_counts().sort_index()
-            hist.index = hist.index.astype(str)  # convert IntervalIndex to string
-            st.bar_chart(hist)
+            # Only the 20 bin counts are sent to the browser.
+            left_edges, counts = prediction_histogram(pred_df["prediction"], bins=20)
+            st.bar_chart(pd.Series(counts, index=[f"{edge:.2f}" for edge in left_edges]))
         else:
-            st.info("No valid numeric prediction data yet")
-    else:
-        st.info("No prediction data yet")
-
-with col2:
-    st.subheader("📉 Streaming Median Trend")
-    if not metrics_df.empty:
-        baseline = get_baseline_median(metrics_df)
-        st.line_chart(metrics_df.set_index("timestamp")["median_value"])
-        st.caption(f"Baseline Median: **{baseline:.3f}**")
-    else:
-        st.info("No metrics yet")
+            st.info("No prediction data yet")
+
+    with col2:
+        st.subheader("📉 Streaming Median Trend")
+        if not metrics_df.empty:
+            baseline = get_baseline_median(metrics_df)
+            st.line_chart(trend(metrics_df, "median_value"))
+            st.caption(f"Baseline Median: **{baseline:.3f}**")
+        else:
+            st.info("No metrics yet")
 
-st.divider()
+    st.divider()
 
-# -------------------------------
-# SECOND ROW: Mean, Median, Std Trend
-# -------------------------------
-col1, col2, col3 = st.columns(3)
+    # -------------------------------
+    # SECOND ROW: Mean, Median, Std Trend
+    # -------------------------------
+    col1, col2, col3 = st.columns(3)
 
-with col1:
-    st.subheader("Mean Trend")
-    if not metrics_df.empty:
-        st.line_chart(metrics_df.set_index("timestamp")["mean_value"])
-    else:
-        st.info("No metrics yet")
+    with col1:
+        st.subheader("Mean Trend")
+        if not metrics_df.empty:
+            st.line_chart(trend(metrics_df, "mean_value"))
+        else:
+            st.info("No metrics yet")
 
-with col2:
-    st.subheader("Median Trend")
-    if not metrics_df.empty:
-        st.line_chart(metrics_df.set_index("timestamp")["median_value"])
-    else:
-        st.info("No metrics yet")
+    with col2:
+        st.subheader("Median Trend")
+        if not metrics_df.empty:
+            st.line_chart(trend(metrics_df, "median_value"))
+        else:
+            st.info("No metrics yet")
 
-with col3:
-    st.subheader("Std Trend")
-    if not metrics_df.empty:
-        st.line_chart(metrics_df.set_index("timestamp")["std_value"])
-    else:
-        st.info("No metrics yet")
+    with col3:
+        st.subheader("Std Trend")
+        if not metrics_df.empty:
+            st.line_chart(trend(metrics_df, "std_value"))
+        else:
+            st.info("No metrics yet")
 
-st.divider()
+    st.divider()
 
-# -------------------------------
-# FEATURE-WISE DRIFT
-# -------------------------------
-st.subheader("🔹 Feature-Wise Drift (Last Measurement)")
-if not metrics_df.empty:
-    last_row = metrics_df.iloc[-1]
-
-    # Mean drift per feature
-    mean_drift_df = pd.DataFrame({
-        "feature": FEATURES,
-        "mean_drift": last_row["mean_drift_vals"],
-        "median_drift": last_row["median_drift_vals"],
-        "std_drift": last_row["std_drift_vals"]
-    })
+    # -------------------------------
+    # FEATURE-WISE DRIFT
+    # -------------------------------
+    st.subheader("🔹 Feature-Wise Drift (Last Measurement)")
+    if not latest_df.empty:
+        last_row = latest_df.iloc[-1]
 
-    st.markdown("**Mean Drift per Feature**")
-    fig = px.bar(mean_drift_df, x="feature", y="mean_drift", title="Mean Drift per Feature",
-                 color="mean_drift", color_continuous_scale="Reds")
-    st.plotly_chart(fig, use_container_width=True)
+        # Mean drift per feature
+        mean_drift_df = pd.DataFrame({
+            "feature": FEATURES,
+            **{stat: [last_row[f"{stat}_{feature}"] for feature in FEATURES] for stat in DRIFT_STATS}
+        })
 
-    st.markdown("**Median Drift per Feature**")
-    fig = px.bar(mean_drift_df, x="feature", y="median_drift", title="Median Drift per Feature",
-                 color="median_drift", color_continuous_scale="Reds")
-    st.plotly_chart(fig, use_container_width=True)
+        st.markdown("**Mean Drift per Feature**")
+        fig = px.bar(mean_drift_df, x="feature", y="mean_drift", title="Mean Drift per Feature",
+                     color="mean_drift", color_continuous_scale="Reds")
+        st.plotly_chart(fig, use_container_width=True)
 
-    st.markdown("**Std Drift per Feature**")
-    fig = px.bar(mean_drift_df, x="feature", y="std_drift", title="Std Drift per Feature",
-                 color="std_drift", color_continuous_scale="Reds")
-    st.plotly_chart(fig, use_container_width=True)
-else:
-    st.info("No metrics yet")
+        st.markdown("**Median Drift per Feature**")
+        fig = px.bar(mean_drift_df, x="feature", y="median_drift", title="Median Drift per Feature",
+                     color="median_drift", color_continuous_scale="Reds")
+        st.plotly_chart(fig, use_container_width=True)
 
-st.divider()
+        st.markdown("**Std Drift per Feature**")
+        fig = px.bar(mean_drift_df, x="feature", y="std_drift", title="Std Drift per Feature",
+                     color="std_drift", color_continuous_scale="Reds")
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.info("No metrics yet")
+
+    st.divider()
+
+    # -------------------------------
+    # DRIFT ALERTS
+    # -------------------------------
+    st.subheader("🚨 Drift Alerts")
+    if not latest_df.empty:
+        latest = latest_df.iloc[-1]
+        current_status = "🚨 DRIFT DETECTED" if latest["alert"] else "✅ NO DRIFT"
+        st.metric(
+            label="Current Drift Status",
+            value=current_status,
+            delta=f"Drift Score: {latest['drift_score']:.4f}"
+        )
+
+        # Drift score over time
+        # Min/max downsampling keeps every drift spike visible.
+        drift_df = downsample(metrics_df, "bucket", "drift_score", MAX_POINTS, method="minmax").copy()
+        drift_df["status"] = drift_df["alert"].map({0: "No Drift", 1: "Drift"})
+        fig = px.scatter(drift_df, x="timestamp", y="drift_score", color="status",
+                         color_discrete_map={"No Drift": "green", "Drift": "red"},
+                         title=f"Max Drift Score per {resolution}s (last {range_label})")
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.info("No drift metrics yet")
+
+    st.divider()
 
-# -------------------------------
-# DRIFT ALERTS
-# -------------------------------
-st.subheader("🚨 Drift Alerts")
-if not metrics_df.empty:
-    latest = metrics_df.iloc[-1]
-    current_status = "🚨 DRIFT DETECTED" if latest["alert"] else "✅ NO DRIFT"
-    st.metric(
-        label="Current Drift Status",
-        value=current_status,
-        delta=f"Drift Score: {latest['drift_score']:.4f}"
-    )
 
-    # Drift score over time
-    drift_df = metrics_df.copy()
-    drift_df["status"] = drift_df["alert"].map({0: "No Drift", 1: "Drift"})
-    fig = px.scatter(drift_df, x="timestamp", y="drift_score", color="status",
-                     color_discrete_map={"No Drift": "green", "Drift": "red"},
-                     title="Drift Score Over Time")
-    st.plotly_chart(fig, use_container_width=True)
-else:
-    st.info("No drift metrics yet")
-
-st.divider()
+range_label = st.sidebar.selectbox("Trend range", list(TREND_RANGES), index=2)
+render_dashboard(range_label)
 
 # -------------------------------
 # FOOTER
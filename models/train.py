@@ -1,10 +1,16 @@
 import json
+import os
 from sklearn.datasets import fetch_california_housing
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_absolute_error, mean_squared_error
 import joblib
 
+from monitoring.baseline import build_baseline_profile, save_baseline_profile
+
+# Serving loads models/model_<version>.pkl; metadata.json names the default.
+MODEL_VERSION = os.getenv("MODEL_VERSION", "v1")
+
 data = fetch_california_housing(as_frame=True)
 
 X = data.data
@@ -20,13 +26,17 @@ mae = mean_absolute_error(y_test, preds)
 rmse = mean_squared_error(y_test, preds)
 print(f"Model trained: MAE={mae:.4f}, RMSE={rmse:.4f}")
 
-joblib.dump(model, "models/model_v1.pkl")
+# Uncompressed, so serving can memory-map the arrays (mmap_mode="r").
+joblib.dump(model, f"models/model_{MODEL_VERSION}.pkl", compress=0)
 
 metadata = {
+    "version": MODEL_VERSION,
     "features": list(X.columns),
     "target": "MedHouseValue",
     "MAE": mae,
     "RMSE": rmse
 }
 with open("models/metadata.json", "w") as f:
-    json.dump(metadata, f, indent=4)
\ No newline at end of file
+    json.dump(metadata, f, indent=4)
+
+save_baseline_profile(build_baseline_profile(X.to_numpy()))
@@ -0,0 +1,192 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from monitoring.db import DB_PATH
+from monitoring.metrics_queue import FEATURES
+
+ARCHIVE_DIR = DB_PATH.parent / "archive" / "predictions"
+
+# Predictions older than this move from SQLite to Parquet.
+ARCHIVE_AFTER_SECONDS = 86400
+
+ARCHIVE_SCHEMA = pa.schema(
+    [("id", pa.int64()), ("timestamp", pa.float64())]
+    + [(feature, pa.float64()) for feature in FEATURES]
+    + [("prediction", pa.float64()), ("request_id", pa.string()), ("model_version", pa.string())]
+)
+# hour=YYYYMMDDHH (UTC) directories, pruned by read_predictions.
+PARTITIONING = ds.partitioning(pa.schema([("hour", pa.int64())]), flavor="hive")
+
+SELECT_CHUNK_SQL = f"""
+    SELECT {", ".join(ARCHIVE_SCHEMA.names)} FROM predictions
+    WHERE timestamp < ? AND id > ?
+    ORDER BY id
+    LIMIT ?
+"""
+
+
+def hour_key(timestamp: float) -> int:
+    return int(datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y%m%d%H"))
+
+
+def _write_partition(archive_dir: Path, hour: int, table: pa.Table):
+    """
+    One part file per archived chunk and hour, named after its first id, so
+    re-running an interrupted chunk overwrites the same file.
+    """
+    directory = archive_dir / f"hour={hour}"
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"part-{table['id'][0].as_py()}.parquet"
+    tmp = path.with_suffix(".parquet.tmp")
+    pq.write_table(table, tmp, compression="zstd")
+    os.replace(tmp, path)
+
+
+def archive_predictions(conn, archive_dir=ARCHIVE_DIR, before=None, chunk_size=50000) -> int:
+    """
+    Move predictions with timestamp < `before` into Parquet, `chunk_size`
+    rows per transaction. Returns the number of rows archived. `conn` must
+    be in autocommit mode (isolation_level=None).
+
+    Each chunk is written and deleted inside one BEGIN IMMEDIATE
+    transaction: a second archiver (another uvicorn worker) waits instead
+    of exporting the same rows, and a crash before COMMIT leaves the rows
+    in SQLite to be exported again.
+    """
+    archive_dir = Path(archive_dir)
+    before = time.time() - ARCHIVE_AFTER_SECONDS if before is None else before
+    archived = 0
+    last_id = 0
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(SELECT_CHUNK_SQL, (before, last_id, chunk_size)).fetchall()
+            if not rows:
+                conn.rollback()
+                return archived
+
+            columns = list(zip(*rows))
+            table = pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, ARCHIVE_SCHEMA)],
+                schema=ARCHIVE_SCHEMA
+            )
+            hours = np.floor(np.asarray(columns[1]) / 3600)
+            for hour in np.unique(hours):
+                _write_partition(archive_dir, hour_key(hour * 3600), table.filter(pa.array(hours == hour)))
+
+            last_id = rows[-1][0]
+            # Exactly the rows selected so far: ids are scanned in order.
+            conn.execute("DELETE FROM predictions WHERE id <= ? AND timestamp < ?", (last_id, before))
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        archived += len(rows)
+
+
+def archive_dataset(archive_dir=ARCHIVE_DIR) -> ds.Dataset:
+    schema = ARCHIVE_SCHEMA.append(pa.field("hour", pa.int64()))
+    return ds.dataset(archive_dir, format="parquet", partitioning=PARTITIONING, schema=schema)
+
+
+def read_predictions(start=None, end=None, columns=None, archive_dir=ARCHIVE_DIR):
+    """
+    Archived predictions with start <= timestamp < end (unix seconds) as a
+    DataFrame, in timestamp order. Hour directories outside the range are
+    skipped, the timestamp filter is pushed down to Parquet row-group
+    statistics, and only `columns` are read (all by default).
+    """
+    if not Path(archive_dir).exists():
+        return ARCHIVE_SCHEMA.empty_table().select(columns or ARCHIVE_SCHEMA.names).to_pandas()
+
+    condition = None
+    if start is not None:
+        condition = (ds.field("hour") >= hour_key(start)) & (ds.field("timestamp") >= start)
+    if end is not None:
+        upper = (ds.field("hour") <= hour_key(end)) & (ds.field("timestamp") < end)
+        condition = upper if condition is None else condition & upper
+
+    columns = list(columns or ARCHIVE_SCHEMA.names)
+    sort_keys = ["timestamp", "id"]
+    scan_columns = columns + [key for key in sort_keys if key not in columns]
+    table = archive_dataset(archive_dir).to_table(columns=scan_columns, filter=condition)
+    table = table.sort_by([(key, "ascending") for key in sort_keys]).select(columns)
+    return table.to_pandas()
+
+
+class PredictionArchiver:
+    """
+    Background thread that moves predictions older than `age_seconds`
+    from SQLite to hourly Parquet partitions every `interval` seconds.
+    Deleted pages are reused by new rows; scripts/compact_db.py shrinks
+    the file itself.
+    """
+
+    def __init__(self, db_path=DB_PATH, archive_dir=ARCHIVE_DIR, age_seconds=ARCHIVE_AFTER_SECONDS,
+                 interval=600.0, chunk_size=50000):
+        self.db_path = db_path
+        self.archive_dir = Path(archive_dir)
+        self.age_seconds = age_seconds
+        self.interval = interval
+        self.chunk_size = chunk_size
+
+        self.rows_archived = 0
+        self.runs = 0
+        self.last_run = None
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self) -> int:
+        # isolation_level=None: archive_predictions manages its transactions.
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            archived = archive_predictions(
+                conn, self.archive_dir, time.time() - self.age_seconds, self.chunk_size
+            )
+        finally:
+            conn.close()
+        self.rows_archived += archived
+        self.runs += 1
+        self.last_run = time.time()
+        if archived:
+            print(f"Archived {archived} predictions to {self.archive_dir}")
+        return archived
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except (sqlite3.Error, OSError, pa.ArrowException) as exc:
+                print(f"Prediction archiving failed: {exc}")
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="prediction-archiver", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "archive_dir": str(self.archive_dir),
+            "age_seconds": self.age_seconds,
+            "interval": self.interval,
+            "runs": self.runs,
+            "rows_archived": self.rows_archived,
+            "last_run": self.last_run,
+        }
@@ -0,0 +1,65 @@
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+from monitoring.histogram import WindowHistogram
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+BASELINE_PATH = ROOT_DIR / "models" / "baseline_profile.npz"
+
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+N_BINS = 20
+
+
+def build_baseline_profile(X) -> dict:
+    """
+    Summarize a (n_samples, n_features) training matrix:
+    - mean, variance (ddof=0) and median per feature
+    - quantiles:   (len(QUANTILES), n_features)
+    - hist_edges:  (n_features, N_BINS + 1), quantiles from min to max, so
+                   heavy-tailed features still spread over every bin
+    - hist_counts: (n_features, N_BINS + 2), in the WindowHistogram layout
+                   (underflow, N_BINS inner bins, overflow)
+    """
+    X = np.asarray(X, dtype=np.float64)
+
+    hist_edges = np.quantile(X, np.linspace(0, 1, N_BINS + 1), axis=0).T
+    hist_counts = WindowHistogram(hist_edges).bin_counts(X)
+
+    return {
+        "n_samples": np.array(len(X)),
+        "mean": X.mean(axis=0),
+        "variance": X.var(axis=0),
+        "median": np.median(X, axis=0),
+        "quantile_levels": np.array(QUANTILES),
+        "quantiles": np.quantile(X, QUANTILES, axis=0),
+        "hist_edges": hist_edges,
+        "hist_counts": hist_counts,
+    }
+
+
+def save_baseline_profile(profile: dict, path=BASELINE_PATH):
+    # Uncompressed, so loading is a straight read of each array.
+    np.savez(path, **profile)
+
+
+@lru_cache(maxsize=1)
+def load_baseline_profile(path=BASELINE_PATH) -> dict:
+    """
+    Load and cache the baseline profile written by models/train.py (or
+    scripts/build_baseline.py). Serving never builds it: that needs the
+    training data, so a missing or outdated profile fails here instead.
+    """
+    path = Path(path)
+    rebuild = "run `python -m models.train` or `python -m scripts.build_baseline` to write it"
+    if not path.exists():
+        raise FileNotFoundError(f"baseline profile {path} not found; {rebuild}")
+
+    with np.load(path) as data:
+        profile = {name: data[name] for name in data.files}
+    # Profiles from before underflow/overflow bins have one count per inner bin.
+    if profile["hist_counts"].shape[1] != profile["hist_edges"].shape[1] + 1:
+        raise ValueError(f"baseline profile {path} predates the current histogram layout; {rebuild}")
+    return profile
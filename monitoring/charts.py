@@ -0,0 +1,96 @@
+import numpy as np
+
+from monitoring.rollups import RESOLUTIONS
+
+MAX_POINTS = 2000
+# Rollup rows read for one chart before downsampling to MAX_POINTS.
+MAX_SOURCE_ROWS = 20000
+
+
+def pick_resolution(span_seconds: float, max_rows=MAX_SOURCE_ROWS) -> int:
+    """
+    Finest rollup resolution that covers the span in at most max_rows
+    buckets (the coarsest one if none does).
+    """
+    for resolution in RESOLUTIONS:
+        if span_seconds / resolution <= max_rows:
+            return resolution
+    return RESOLUTIONS[-1]
+
+
+def lttb(x, y, n_out=MAX_POINTS) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling. Returns the indices of the
+    n_out points kept (first and last always included), in order.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # n_out - 2 buckets between the fixed first and last points.
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x = x[end:edges[i + 2]].mean()
+            next_y = y[end:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+
+        area = np.abs(
+            (x[a] - next_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (next_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def min_max(y, n_out=MAX_POINTS) -> np.ndarray:
+    """
+    Indices of the min and max of each of n_out / 2 equal buckets, so
+    spikes survive downsampling (used for drift scores).
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n_out >= n or n_out < 2:
+        return np.arange(n)
+
+    bounds = np.linspace(0, n, n_out // 2 + 1).astype(np.int64)
+    keep = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        if end > start:
+            chunk = y[start:end]
+            keep.append(start + np.argmin(chunk))
+            keep.append(start + np.argmax(chunk))
+    return np.unique(keep)
+
+
+def downsample(df, x: str, column: str, max_points=MAX_POINTS, method="lttb"):
+    """
+    Rows of df (sorted by x) to plot for one column, at most max_points.
+    """
+    if len(df) <= max_points:
+        return df
+    values = df[column].to_numpy()
+    if method == "minmax":
+        index = min_max(values, max_points)
+    else:
+        index = lttb(df[x].to_numpy(), values, max_points)
+    return df.iloc[index]
+
+
+def prediction_histogram(values, bins=20):
+    """
+    Equal-width histogram of a prediction column: (left edges, counts).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    counts, edges = np.histogram(values, bins=bins)
+    return edges[:-1], counts
@@ -1,75 +1,178 @@
+import atexit
 import sqlite3
+import threading
 from pathlib import Path
 from datetime import datetime,timezone
-import json
+import time
+
+from monitoring.metrics_queue import FEATURES
+from monitoring.rollups import CREATE_ROLLUPS_SQL, UPSERT_ROLLUP_SQL, RollupAggregator, apply_retention
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 DB_PATH = BASE_DIR / "monitoring" / "monitoring.db"
 DB_PATH.parent.mkdir(exist_ok=True)
 
+METRIC_FEATURE_STATS = ("mean_drift", "median_drift", "std_drift", "psi", "ks", "wasserstein")
+METRIC_FEATURE_COLUMNS = [f"{stat}_{feature}" for stat in METRIC_FEATURE_STATS for feature in FEATURES]
+
+# PRAGMA user_version of the current schema; see migrate().
+SCHEMA_VERSION = 1
+
 def get_connection():
     return sqlite3.connect(DB_PATH, check_same_thread=False)
 
-def init_db():
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
+def create_tables(cursor):
+    """
+    Current schema: one typed REAL column per feature, so per-feature
+    series are plain column reads over an indexed timestamp range.
+    """
+    cursor.execute(f"""
     CREATE TABLE IF NOT EXISTS predictions (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         timestamp REAL,
-        features TEXT,
+        {", ".join(f"{feature} REAL" for feature in FEATURES)},
         prediction REAL,
-        request_id TEXT
+        request_id TEXT,
+        model_version TEXT
     )
     """)
 
-    cursor.execute("""
+    cursor.execute(f"""
     CREATE TABLE IF NOT EXISTS metrics (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp REAL,
-            median_value REAL,            
-            mean_value REAL,              
-            std_value REAL,               
-            drift_score REAL,             
-            mean_ratio REAL,
-            median_ratio REAL,
-            std_ratio REAL,
-            alert INTEGER,                
-            mean_drift_vals TEXT,         
-            median_drift_vals TEXT,       
-            std_drift_vals TEXT           
-        )
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp REAL,
+        median_value REAL,
+        mean_value REAL,
+        std_value REAL,
+        drift_score REAL,
+        mean_ratio REAL,
+        median_ratio REAL,
+        std_ratio REAL,
+        alert INTEGER,
+        model_version TEXT,
+        psi_max REAL,
+        ks_max REAL,
+        wasserstein_max REAL,
+        {", ".join(f"{column} REAL" for column in METRIC_FEATURE_COLUMNS)}
+    )
     """)
 
-    conn.commit()
-    conn.close()
+    cursor.execute(CREATE_ROLLUPS_SQL)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_predictions_timestamp ON predictions (timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_predictions_request_id ON predictions (request_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_metrics_timestamp ON metrics (timestamp)")
 
-def add_metric( median_value: float,mean_value: float,std_value: float,drift_score: float,
-                mean_ratio: float,median_ratio: float,std_ratio: float,alert: int,
-                mean_drift_vals: list,median_drift_vals: list,std_drift_vals: list ):
-    conn = get_connection()
+def init_db():
+    """
+    Create or migrate the schema. The version check and any change run in
+    one BEGIN IMMEDIATE transaction, so when several uvicorn workers start
+    at once only the first migrates and the others see the new version.
+    """
+    conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
     cursor = conn.cursor()
 
-    timestamp = datetime.now(timezone.utc).timestamp()
-    cursor.execute("""
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        tables = {row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        if "predictions" in tables and version < SCHEMA_VERSION:
+            migrate(conn)
+        else:
+            create_tables(cursor)
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        cursor.execute("COMMIT")
+    except BaseException:
+        cursor.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+def add_column_if_missing(cursor, table: str, column: str, column_type: str):
+    columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+def migrate(conn):
+    """
+    Upgrade a version 0 database (features and per-feature drift stored as
+    JSON text) to typed per-feature columns. Runs inside the caller's
+    transaction (init_db). JSON is unpacked by SQLite's json_extract, so no
+    row passes through Python.
+    """
+    print("Migrating monitoring.db to typed per-feature columns...")
+    cursor = conn.cursor()
+
+    # Version 0 databases may predate any of the later ALTER TABLE columns.
+    add_column_if_missing(cursor, "predictions", "model_version", "TEXT")
+    add_column_if_missing(cursor, "metrics", "model_version", "TEXT")
+    for stat in ("psi", "ks", "wasserstein"):
+        add_column_if_missing(cursor, "metrics", f"{stat}_max", "REAL")
+        add_column_if_missing(cursor, "metrics", f"{stat}_vals", "TEXT")
+
+    cursor.execute("DROP INDEX IF EXISTS idx_predictions_timestamp")
+    cursor.execute("DROP INDEX IF EXISTS idx_metrics_timestamp")
+    cursor.execute("ALTER TABLE predictions RENAME TO predictions_v0")
+    cursor.execute("ALTER TABLE metrics RENAME TO metrics_v0")
+    create_tables(cursor)
+
+    cursor.execute(f"""
+        INSERT INTO predictions (id, timestamp, {", ".join(FEATURES)}, prediction, request_id, model_version)
+        SELECT id, timestamp,
+               {", ".join(f"json_extract(features, '$.{feature}')" for feature in FEATURES)},
+               prediction, request_id, model_version
+        FROM predictions_v0
+    """)
+
+    extracted = [
+        f"json_extract({stat}_vals, '$[{i}]')"
+        for stat in METRIC_FEATURE_STATS for i in range(len(FEATURES))
+    ]
+    cursor.execute(f"""
         INSERT INTO metrics (
-            timestamp, 
-            median_value, 
-            mean_value, 
-            std_value, 
-            drift_score, 
-            mean_ratio, 
-            median_ratio, 
-            std_ratio, 
-            alert,
-            mean_drift_vals,
-            median_drift_vals,
-            std_drift_vals
+            id, timestamp, median_value, mean_value, std_value, drift_score,
+            mean_ratio, median_ratio, std_ratio, alert, model_version,
+            psi_max, ks_max, wasserstein_max, {", ".join(METRIC_FEATURE_COLUMNS)}
         )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
+        SELECT id, timestamp, median_value, mean_value, std_value, drift_score,
+               mean_ratio, median_ratio, std_ratio, alert, model_version,
+               psi_max, ks_max, wasserstein_max, {", ".join(extracted)}
+        FROM metrics_v0
+    """)
+
+    cursor.execute("DROP TABLE predictions_v0")
+    cursor.execute("DROP TABLE metrics_v0")
+    cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    print("Migration complete.")
+
+METRIC_COLUMNS = [
+    "timestamp", "median_value", "mean_value", "std_value", "drift_score",
+    "mean_ratio", "median_ratio", "std_ratio", "alert", "model_version",
+    "psi_max", "ks_max", "wasserstein_max",
+] + METRIC_FEATURE_COLUMNS
+
+INSERT_METRIC_SQL = f"""
+    INSERT INTO metrics ({", ".join(METRIC_COLUMNS)})
+    VALUES ({", ".join("?" for _ in METRIC_COLUMNS)})
+"""
+
+INSERT_PREDICTION_SQL = f"""
+    INSERT INTO predictions (timestamp, {", ".join(FEATURES)}, prediction, request_id, model_version)
+    VALUES ({", ".join("?" for _ in range(len(FEATURES) + 4))})
+"""
+
+def metric_row( median_value: float,mean_value: float,std_value: float,drift_score: float,
+                mean_ratio: float,median_ratio: float,std_ratio: float,alert: int,
+                mean_drift_vals: list,median_drift_vals: list,std_drift_vals: list,
+                model_version: str = None, psi_vals: list = None, ks_vals: list = None,
+                wasserstein_vals: list = None ):
+    timestamp = datetime.now(timezone.utc).timestamp()
+    distribution = (psi_vals, ks_vals, wasserstein_vals)
+    per_feature = [*mean_drift_vals, *median_drift_vals, *std_drift_vals]
+    for vals in distribution:
+        per_feature.extend([None] * len(FEATURES) if vals is None else vals)
+    return (
         timestamp,
         median_value,
         mean_value,
@@ -79,26 +182,174 @@ def add_metric( median_value: float,mean_value: float,std_value: float,drift_sco
         median_ratio,
         std_ratio,
         alert,
-        json.dumps(mean_drift_vals),
-        json.dumps(median_drift_vals),
-        json.dumps(std_drift_vals)
-    ))
+        model_version,
+        *(None if vals is None else max(vals) for vals in distribution),
+        *per_feature
+    )
 
+def prediction_row(features, prediction: float, request_id: str, model_version: str = None):
+    """
+    features is a dict keyed by feature name or a row of values in FEATURES order.
+    """
+    timestamp = datetime.now(timezone.utc).timestamp()
+    if isinstance(features, dict):
+        values = [features[feature] for feature in FEATURES]
+    else:
+        values = [float(value) for value in features]
+    return (timestamp, *values, prediction, request_id, model_version)
+
+def add_metric( median_value: float,mean_value: float,std_value: float,drift_score: float,
+                mean_ratio: float,median_ratio: float,std_ratio: float,alert: int,
+                mean_drift_vals: list,median_drift_vals: list,std_drift_vals: list,
+                model_version: str = None ):
+    conn = get_connection()
+    conn.execute(INSERT_METRIC_SQL, metric_row(
+        median_value, mean_value, std_value, drift_score,
+        mean_ratio, median_ratio, std_ratio, alert,
+        mean_drift_vals, median_drift_vals, std_drift_vals,
+        model_version
+    ))
     conn.commit()
     conn.close()
     print("Metric added successfully!")
 
-def add_prediction(features: dict, prediction: float, request_id: str):
+def add_prediction(features: dict, prediction: float, request_id: str, model_version: str = None):
     conn = get_connection()
-    cursor = conn.cursor()
+    conn.execute(INSERT_PREDICTION_SQL, prediction_row(features, prediction, request_id, model_version))
+    conn.commit()
+    conn.close()
+    print("Prediction added successfully!")
 
-    timestamp = datetime.now(timezone.utc).timestamp()
-    features_json = json.dumps(features)       
 
-    cursor.execute("""
-        INSERT INTO predictions (timestamp, features, prediction, request_id)
-        VALUES (?, ?, ?, ?)
-    """, (timestamp, features_json, prediction, request_id))
-    
-    conn.commit()
-    print("Prediction added successfully!")
\ No newline at end of file
+class BatchWriter:
+    """
+    Persistent SQLite writer for predictions and metrics.
+
+    Rows are buffered in memory and written with executemany in a single
+    transaction when `batch_size` rows are pending or every
+    `flush_interval` seconds, whichever comes first. The connection runs in
+    WAL mode with synchronous=NORMAL, so a flush does not fsync per row and
+    readers (the dashboard) do not block the writer.
+
+    Metrics are also folded into 1s / 1m / 1h rollup buckets
+    (monitoring/rollups.py), written as partial rows on each flush until
+    they close, and every `retention_interval` seconds rows past their
+    retention are deleted.
+    """
+
+    def __init__(self, db_path=DB_PATH, batch_size=500, flush_interval=1.0,
+                 cache_size_kb=20000, retention_interval=300.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_interval = retention_interval
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(f"PRAGMA cache_size=-{int(cache_size_kb)}")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+
+        self._predictions = []
+        self._metrics = []
+        self._rollups = []
+        self._aggregator = RollupAggregator()
+        self._last_retention = time.monotonic()
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self.rows_written = 0
+        self.flushes = 0
+
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name="db-writer", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def add_prediction(self, features: dict, prediction: float, request_id: str,
+                       model_version: str = None):
+        row = prediction_row(features, prediction, request_id, model_version)
+        with self._lock:
+            self._predictions.append(row)
+            pending = len(self._predictions) + len(self._metrics)
+        if pending >= self.batch_size:
+            self.flush()
+
+    def add_predictions(self, features: list, predictions: list, request_ids: list,
+                        model_version: str = None):
+        if hasattr(features, "tolist"):  # (k, n_features) array
+            features = features.tolist()
+        rows = [
+            prediction_row(f, p, r, model_version)
+            for f, p, r in zip(features, predictions, request_ids)
+        ]
+        with self._lock:
+            self._predictions.extend(rows)
+            pending = len(self._predictions) + len(self._metrics)
+        if pending >= self.batch_size:
+            self.flush()
+
+    def add_metric(self, **metric):
+        row = metric_row(**metric)
+        with self._lock:
+            self._metrics.append(row)
+            self._rollups.extend(self._aggregator.add(row[0], metric))
+            pending = len(self._predictions) + len(self._metrics)
+        if pending >= self.batch_size:
+            self.flush()
+
+    def flush(self, close_buckets=False):
+        with self._lock:
+            if close_buckets:
+                self._rollups.extend(self._aggregator.flush_all())
+            else:
+                self._rollups.extend(self._aggregator.flush_open())
+            if self._closed or not (self._predictions or self._metrics or self._rollups):
+                return
+            predictions, metrics, rollups = self._predictions, self._metrics, self._rollups
+
+            # A failed transaction is rolled back and the rows stay buffered
+            # for the next flush (e.g. after "database is locked").
+            with self.conn:
+                if predictions:
+                    self.conn.executemany(INSERT_PREDICTION_SQL, predictions)
+                if metrics:
+                    self.conn.executemany(INSERT_METRIC_SQL, metrics)
+                if rollups:
+                    self.conn.executemany(UPSERT_ROLLUP_SQL, rollups)
+            self._predictions, self._metrics, self._rollups = [], [], []
+
+            self.rows_written += len(predictions) + len(metrics) + len(rollups)
+            self.flushes += 1
+
+    def apply_retention(self):
+        with self._lock:
+            if self._closed:
+                return {}
+            deleted = apply_retention(self.conn)
+        if any(deleted.values()):
+            print(f"Retention removed {deleted}")
+        return deleted
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+                if time.monotonic() - self._last_retention >= self.retention_interval:
+                    self._last_retention = time.monotonic()
+                    self.apply_retention()
+            except sqlite3.Error as exc:
+                print(f"Batch flush failed: {exc}")
+
+    def close(self):
+        """
+        Flush pending rows and close the connection. Safe to call twice.
+        """
+        if self._closed:
+            return
+        self._stop.set()
+        self._flusher.join()
+        self.flush(close_buckets=True)
+        with self._lock:
+            self._closed = True
+            self.conn.close()
+        atexit.unregister(self.close)
@@ -0,0 +1,106 @@
+from typing import NamedTuple
+
+import numpy as np
+
+STATS = ("mean", "median", "variance")
+
+
+class DriftResult(NamedTuple):
+    stats: np.ndarray       # (3, n_features): mean, median, variance of the window
+    drift: np.ndarray       # (3, n_features): |baseline - stats|
+    alerts: np.ndarray      # (3, n_features) bool: drift > threshold
+    ratios: np.ndarray      # (3,): share of alerting features per statistic
+    drift_score: float
+    alert: int
+
+
+class DistributionDrift(NamedTuple):
+    psi: np.ndarray          # (n_features,) population stability index
+    ks: np.ndarray           # (n_features,) max |CDF difference| over bin edges
+    wasserstein: np.ndarray  # (n_features,) W1 distance, in feature units
+
+
+def baseline_matrix(mean, median, variance) -> np.ndarray:
+    """
+    Stack baseline vectors in STATS order into a (3, n_features) array.
+    """
+    return np.array([mean, median, variance], dtype=np.float64)
+
+
+def drift_from_stats(stats, baseline, threshold, global_threshold) -> DriftResult:
+    """
+    Compare window statistics against the baseline in one vectorized pass.
+
+    stats and baseline are (3, n_features) arrays in STATS order. The drift
+    score is the larger of the mean and median alert ratios.
+    """
+    stats = np.asarray(stats, dtype=np.float64)
+    drift = np.abs(baseline - stats)
+    alerts = drift > threshold
+    ratios = alerts.mean(axis=1)
+
+    drift_score = float(max(ratios[0], ratios[1]))
+    return DriftResult(
+        stats=stats,
+        drift=drift,
+        alerts=alerts,
+        ratios=ratios,
+        drift_score=drift_score,
+        alert=int(drift_score >= global_threshold),
+    )
+
+
+def drift_kernel(window, baseline, threshold, global_threshold) -> DriftResult:
+    """
+    Compute window statistics and drift for a (window, n_features) array.
+    """
+    window = np.asarray(window, dtype=np.float64)
+    stats = np.array([
+        window.mean(axis=0),
+        np.median(window, axis=0),
+        window.var(axis=0),
+    ])
+    return drift_from_stats(stats, baseline, threshold, global_threshold)
+
+
+def distribution_drift(counts, baseline_counts, edges, tail_excess=None, eps=1e-4) -> DistributionDrift:
+    """
+    PSI, KS and Wasserstein-1 per feature from two (n_features, n_edges + 1)
+    histograms in the WindowHistogram layout (underflow, inner bins,
+    overflow). Cost is O(n_features * n_bins).
+
+    Empty bins are floored at `eps` for PSI, so live mass in a bin the
+    baseline never reached (such as the underflow and overflow bins) scores
+    high. KS is taken at the bin edges; W1 assumes values are spread
+    evenly inside each inner bin. The baseline has no mass outside
+    the edges, so W1 over the tails is the live window's mean distance
+    past the outermost edges, taken from `tail_excess` (its summed
+    distances, n_features x 2).
+    """
+    p = np.asarray(counts, dtype=np.float64)
+    q = np.asarray(baseline_counts, dtype=np.float64)
+    n_live = np.maximum(p.sum(axis=1), 1.0)
+    p = p / n_live[:, None]
+    q = q / np.maximum(q.sum(axis=1, keepdims=True), 1.0)
+
+    p_eps = np.maximum(p, eps)
+    q_eps = np.maximum(q, eps)
+    psi = ((p_eps - q_eps) * np.log(p_eps / q_eps)).sum(axis=1)
+
+    gap = np.cumsum(p, axis=1) - np.cumsum(q, axis=1)
+    ks = np.abs(gap).max(axis=1)
+    # Inner bin i (1-based) spans edges[i-1]..edges[i]; both CDFs are taken
+    # as linear inside it, so |gap| is integrated between its values at
+    # the two edges (a and b), splitting the bin where the sign changes.
+    a, b = gap[:, :-2], gap[:, 1:-1]
+    span = np.abs(a) + np.abs(b)
+    area = np.where(
+        a * b >= 0,
+        span / 2,
+        (a * a + b * b) / (2 * np.where(span > 0, span, 1.0))
+    )
+    wasserstein = (area * np.diff(edges, axis=1)).sum(axis=1)
+    if tail_excess is not None:
+        wasserstein = wasserstein + np.asarray(tail_excess).sum(axis=1) / n_live
+
+    return DistributionDrift(psi=psi, ks=ks, wasserstein=wasserstein)
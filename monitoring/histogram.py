@@ -0,0 +1,73 @@
+import numpy as np
+
+
+class WindowHistogram:
+    """
+    Per-feature counts over fixed bins, updated as rows enter and leave the
+    window, so distribution drift needs no sort of the window.
+
+    edges is (n_features, n_edges): the baseline profile's hist_edges,
+    quantiles of the training data from its min to its max, so each inner
+    bin holds about the same baseline mass. Counts have n_edges + 1 bins
+    per feature:
+    - bin 0:            underflow, x < edges[0]
+    - bins 1..n_edges-1: [edges[i-1], edges[i]), the last one closed
+    - bin n_edges:      overflow, x > edges[-1]
+
+    Out-of-range values are never clipped into an inner bin. Their distance
+    past the outermost edge is summed in tail_excess (n_features, 2:
+    underflow, overflow), so Wasserstein-1 covers the tails exactly.
+    """
+
+    def __init__(self, edges):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.n_features, n_edges = self.edges.shape
+        self.n_bins = n_edges + 1
+        self._offsets = np.arange(self.n_features) * self.n_bins
+
+        self.counts = np.zeros((self.n_features, self.n_bins), dtype=np.int64)
+        self.tail_excess = np.zeros((self.n_features, 2))
+
+    def bin_index(self, rows) -> np.ndarray:
+        """
+        (k, n_features) bin of every value, underflow and overflow included.
+        """
+        rows = np.atleast_2d(np.asarray(rows, dtype=np.float64))
+        bins = np.empty(rows.shape, dtype=np.int64)
+        for j, edges in enumerate(self.edges):
+            bins[:, j] = np.searchsorted(edges, rows[:, j], side="right")
+        # The top edge (the baseline max) belongs to the last inner bin.
+        bins[rows == self.edges[:, -1]] = self.n_bins - 2
+        return bins
+
+    def measure(self, rows):
+        """
+        (counts, tail_excess) of a (k, n_features) batch.
+        """
+        rows = np.atleast_2d(np.asarray(rows, dtype=np.float64))
+        flat = (self.bin_index(rows) + self._offsets).ravel()
+        counts = np.bincount(flat, minlength=self.n_features * self.n_bins).reshape(self.n_features, self.n_bins)
+        excess = np.stack([
+            np.maximum(self.edges[:, 0] - rows, 0.0).sum(axis=0),
+            np.maximum(rows - self.edges[:, -1], 0.0).sum(axis=0),
+        ], axis=1)
+        return counts, excess
+
+    def bin_counts(self, rows) -> np.ndarray:
+        return self.measure(rows)[0]
+
+    def add(self, rows):
+        counts, excess = self.measure(rows)
+        self.counts += counts
+        self.tail_excess += excess
+
+    def remove(self, rows):
+        counts, excess = self.measure(rows)
+        self.counts -= counts
+        self.tail_excess = np.maximum(self.tail_excess - excess, 0.0)
+
+    def reset(self, rows=None):
+        self.counts[:] = 0
+        self.tail_excess[:] = 0.0
+        if rows is not None and len(rows):
+            self.add(rows)
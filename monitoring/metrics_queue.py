@@ -1,22 +1,112 @@
-from collections import deque
 from datetime import datetime, timezone
-import pandas as pd
 
-STREAM_BUFFER = deque(maxlen=10000)
+import numpy as np
 
+FEATURES = [f"feature{i}" for i in range(1, 9)]
 
-def add_in_buffer(buffer,features: dict, prediction: float, req_id: str):
-    buffer.append({
-        "timestamp": datetime.now(timezone.utc),
-        "req_id": req_id,
-        "features": features,
-        "prediction": prediction
-    })
-    print('data appended in buffer')
 
+class RingBuffer:
+    """
+    Fixed-capacity columnar buffer of the most recent predictions:
+    - features:    (capacity, n_features) float64
+    - timestamps:  (capacity,) float64, unix seconds
+    - predictions: (capacity,) float64
 
-def get_features_df(buffer) -> pd.DataFrame:
-    recent_items = list(buffer)
-    features_list = [item["features"] for item in recent_items]
+    All storage is allocated up front. append is O(1) and overwrites the
+    oldest row once the buffer is full; readers get views, never copies.
+    """
 
-    return pd.DataFrame(features_list)
+    def __init__(self, capacity: int, feature_names: list):
+        self.maxlen = capacity
+        self.feature_names = list(feature_names)
+
+        self.features = np.zeros((capacity, len(self.feature_names)), dtype=np.float64)
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.predictions = np.zeros(capacity, dtype=np.float64)
+
+        self.head = 0   # next slot to write
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, features, prediction: float, timestamp: float):
+        """
+        Write one row. Returns a copy of the evicted feature row, or None
+        while the buffer is still filling.
+        """
+        i = self.head
+        evicted = self.features[i].copy() if self.count == self.maxlen else None
+
+        self.features[i] = features
+        self.timestamps[i] = timestamp
+        self.predictions[i] = prediction
+
+        self.head = (i + 1) % self.maxlen
+        self.count = min(self.count + 1, self.maxlen)
+        return evicted
+
+    def extend(self, features, predictions, timestamp: float):
+        """
+        Write a batch of k <= capacity rows. Returns a copy of the evicted
+        feature rows (oldest first), or None if nothing was evicted.
+        """
+        k = len(features)
+        if k > self.maxlen:
+            raise ValueError(f"batch of {k} rows exceeds capacity {self.maxlen}")
+
+        slots = (self.head + np.arange(k)) % self.maxlen
+        n_evicted = max(self.count + k - self.maxlen, 0)
+        evicted = self.features[slots[k - n_evicted:]] if n_evicted else None
+
+        self.features[slots] = features
+        self.timestamps[slots] = timestamp
+        self.predictions[slots] = predictions
+
+        self.head = (self.head + k) % self.maxlen
+        self.count = min(self.count + k, self.maxlen)
+        return evicted
+
+    def segments(self):
+        """
+        Return the (start, stop) slot ranges holding the window, oldest first.
+        """
+        if self.count < self.maxlen:
+            return [(0, self.count)]
+        if self.head == 0:
+            return [(0, self.maxlen)]
+        return [(self.head, self.maxlen), (0, self.head)]
+
+    def views(self, column: str = "features"):
+        """
+        Return zero-copy views of a column in chronological order: one view,
+        or two once the write position has wrapped around.
+        """
+        data = getattr(self, column)
+        return [data[start:stop] for start, stop in self.segments()]
+
+
+STREAM_BUFFER = RingBuffer(capacity=10000, feature_names=FEATURES)
+
+
+def add_in_buffer(buffer, features: dict, prediction: float):
+    timestamp = datetime.now(timezone.utc).timestamp()
+    return buffer.append(list(features.values()), prediction, timestamp)
+
+
+def add_batch_in_buffer(buffer, features, predictions):
+    """
+    Append a (k, n_features) batch. Returns the evicted rows, if any.
+    """
+    timestamp = datetime.now(timezone.utc).timestamp()
+    return buffer.extend(features, predictions, timestamp)
+
+
+def get_features_df(buffer):
+    """
+    Materialize the window as a DataFrame (for offline inspection only).
+    """
+    import pandas as pd
+
+    features = np.concatenate(buffer.views("features"))
+    return pd.DataFrame(features, columns=buffer.feature_names)
@@ -1,92 +1,181 @@
+import threading
 import time
 from pathlib import Path
-from monitoring.db import get_connection,init_db,add_metric,add_prediction
-from sklearn.datasets import fetch_california_housing
-from monitoring.streaming_median import StreamingMedian
-import pandas as pd
+from monitoring.db import BatchWriter,init_db
+from monitoring.window_stats import SlidingWindowStats,check_finite
+from monitoring.drift import baseline_matrix,distribution_drift,drift_from_stats
+from monitoring.baseline import load_baseline_profile
 import numpy as np
 from datetime import datetime,timezone
-from monitoring.metrics_queue import STREAM_BUFFER,add_in_buffer,get_features_df
+from monitoring.metrics_queue import STREAM_BUFFER,FEATURES,add_in_buffer,add_batch_in_buffer
+from monitoring.sketches import BucketedSketches
 
 ROOT_DIR = Path(__file__).resolve().parent.parent
 DB_PATH = ROOT_DIR/'monitoring'/'monitoring.db'
 
 
-data = fetch_california_housing(as_frame=True)
-
-df = data.data
-
-BASELINE_MEDIAN = df.median().tolist()
-BASELINE_MEAN =  df.mean().tolist()
-BASELINE_STD = df.var(ddof=0).tolist()
-
 class MetricsProcessor:
 
-    def __init__(self,drift_threshold,global_threshold):
+    def __init__(self,drift_threshold,global_threshold,shared_window=False):
+        """
+        With shared_window=True the window lives in shared memory and is fed
+        by every worker process on the host; only the worker holding the
+        aggregator lease writes metrics rows.
+        """
         init_db()
 
         self.queue_data_threshold = 5
-        self.stream_buffer = STREAM_BUFFER
         self.drift_threshold = drift_threshold
         self.golbal_threshold = global_threshold
-        
-    def get_drift_value(self, baseline, streaming):
-        return [abs(b - s) for b, s in zip(baseline, streaming)]
-
-
-    def backend_ops(self, prediction_request,prediction_value,request_id):
-
-        add_in_buffer(self.stream_buffer,prediction_request,prediction_value,request_id)
-
+        self.baseline_profile = load_baseline_profile()
+        self.baseline = baseline_matrix(
+            self.baseline_profile["mean"],
+            self.baseline_profile["median"],
+            self.baseline_profile["variance"]
+        )
+
+        if shared_window:
+            # POSIX-only (fcntl); imported here so the API still loads on Windows.
+            from monitoring.shared_window import AggregatorLease,SharedRingBuffer,SharedWindowStats
+
+            self.stream_buffer = SharedRingBuffer(
+                capacity=STREAM_BUFFER.maxlen,
+                feature_names=FEATURES,
+                shift=self.baseline_profile["mean"]
+            )
+            self.window_stats = SharedWindowStats(self.stream_buffer,edges=self.baseline_profile["hist_edges"])
+            self.aggregator = AggregatorLease()
+        else:
+            self.stream_buffer = STREAM_BUFFER
+            self.window_stats = SlidingWindowStats(self.stream_buffer,edges=self.baseline_profile["hist_edges"])
+            self.aggregator = None
+        # Per-feature t-digests in 5 minute buckets over the last 24 hours,
+        # for quantiles and drift beyond the 10k-row window.
+        self.sketches = BucketedSketches(len(FEATURES), bucket_seconds=300, max_buckets=288)
+        self._sketch_lock = threading.Lock()
+        self.writer = BatchWriter()
+        self.model_version = None  # version that served the latest ingested event
+
+    def backend_ops(self, prediction_request,prediction_value,request_id,model_version=None):
+        self.ingest(prediction_request,prediction_value,request_id,model_version)
+        self.compute_metrics()
+
+    def ingest(self, prediction_request,prediction_value,request_id,model_version=None):
+        """
+        Add one prediction to the window and persist it. Cheap enough to run
+        per event; drift is computed separately by compute_metrics.
+        """
+        row = list(prediction_request.values())
+        # Checked before the buffer append so buffer and stats stay in step.
+        check_finite(row)
+        evicted = add_in_buffer(self.stream_buffer,prediction_request,prediction_value)
+        self.window_stats.push(row,evicted)
+        with self._sketch_lock:
+            self.sketches.update(row)
+        self.writer.add_prediction(prediction_request,prediction_value,request_id,model_version)
+        self.model_version = model_version
+
+    def ingest_batch(self, prediction_requests,prediction_values,request_ids,model_version=None):
+        """
+        Batch version of ingest: one window update and one write for k rows.
+        prediction_requests is a list of feature dicts or a (k, n_features) array.
+        """
+        if isinstance(prediction_requests, np.ndarray):
+            rows = np.asarray(prediction_requests, dtype=np.float64)
+        else:
+            rows = np.array([list(r.values()) for r in prediction_requests], dtype=np.float64)
+        values = np.asarray(prediction_values, dtype=np.float64)
+        check_finite(rows)
+        step = self.stream_buffer.maxlen
+
+        for start in range(0, len(rows), step):
+            chunk = slice(start, start + step)
+            evicted = add_batch_in_buffer(self.stream_buffer,rows[chunk],values[chunk])
+            self.window_stats.push_batch(rows[chunk],evicted)
+        with self._sketch_lock:
+            self.sketches.update(rows)
+
+        self.writer.add_predictions(rows,prediction_values,request_ids,model_version)
+        self.model_version = model_version
+
+    def compute_metrics(self):
+        """
+        Compute drift over the current window and store a metrics row.
+        """
+        if self.aggregator is not None and not self.aggregator.acquire():
+            return
         if len(self.stream_buffer) > self.queue_data_threshold:
-            print("more than 500")
-            streaming_df = get_features_df(self.stream_buffer)
- 
-            streaming_mean = []
-            streaming_median = []
-            streaming_std = []
-
-            for col in streaming_df.columns:
-
-                values = streaming_df[col].values
-
-                sm = StreamingMedian()
-
-                for v in values:
-                    sm.insert(v)
-
-                streaming_mean.append(values.mean())
-                streaming_median.append(sm.get_median())
-                streaming_std.append(values.var(ddof=0))
-
-            mean_drift_val = self.get_drift_value(BASELINE_MEAN,streaming_mean)
-            median_drift_val = self.get_drift_value(BASELINE_MEDIAN,streaming_median)
-            std_drift_val = self.get_drift_value(BASELINE_STD,streaming_std)
-
-            mean_feature_alerts = [ d > self.drift_threshold for d in mean_drift_val]
-            median_feature_alerts = [ d > self.drift_threshold for d in median_drift_val]
-            std_feature_alerts = [d > self.drift_threshold for d in std_drift_val]
-
-            mean_ratio   = sum(mean_feature_alerts)   / len(mean_feature_alerts)
-            median_ratio = sum(median_feature_alerts) / len(median_feature_alerts)
-            std_ratio    = sum(std_feature_alerts)    / len(std_feature_alerts)
-
-            drift_score = max(mean_ratio, median_ratio)
-            global_alert = int(drift_score >= 0.3)
-            print("adding in matrix")
-            add_metric(
-                median_value = np.mean(streaming_median),
-                mean_value = np.mean(streaming_mean),
-                std_value = np.mean(streaming_std),
-                drift_score = drift_score,
+            stats = np.array([
+                self.window_stats.mean(),
+                self.window_stats.median(),
+                self.window_stats.variance()
+            ])
+            result = drift_from_stats(stats,self.baseline,self.drift_threshold,self.golbal_threshold)
+            mean_ratio, median_ratio, std_ratio = result.ratios.tolist()
+            mean_value, median_value, std_value = stats.mean(axis=1).tolist()
+            mean_drift_val, median_drift_val, std_drift_val = result.drift.tolist()
+            counts, tail_excess = self.window_stats.histogram()
+            distribution = distribution_drift(
+                counts,
+                self.baseline_profile["hist_counts"],
+                self.baseline_profile["hist_edges"],
+                tail_excess
+            )
+
+            self.writer.add_metric(
+                median_value = median_value,
+                mean_value = mean_value,
+                std_value = std_value,
+                drift_score = result.drift_score,
                 mean_ratio = mean_ratio,
                 median_ratio = median_ratio,
                 std_ratio = std_ratio,
-                alert = global_alert,
+                alert = result.alert,
                 mean_drift_vals = mean_drift_val,
                 median_drift_vals = median_drift_val,
-                std_drift_vals = std_drift_val
+                std_drift_vals = std_drift_val,
+                model_version = self.model_version,
+                psi_vals = distribution.psi.tolist(),
+                ks_vals = distribution.ks.tolist(),
+                wasserstein_vals = distribution.wasserstein.tolist()
             )
 
-
-        add_prediction(prediction_request,prediction_value,request_id)
\ No newline at end of file
+    def horizon_drift(self, seconds=None):
+        """
+        Compare sketch quantiles over the last `seconds` of traffic (all
+        retained buckets if None) with the baseline quantiles.
+        """
+        with self._sketch_lock:
+            merged = self.sketches.merged(seconds)
+        if len(merged) <= self.queue_data_threshold:
+            return None
+
+        levels = self.baseline_profile["quantile_levels"]
+        quantiles = merged.quantiles(levels)
+        drift = np.abs(quantiles - self.baseline_profile["quantiles"])
+        alerts = drift > self.drift_threshold
+        median_ratio = float(alerts[list(levels).index(0.5)].mean())
+        return {
+            "n": len(merged),
+            "quantile_levels": levels.tolist(),
+            "quantiles": quantiles.tolist(),
+            "drift": drift.tolist(),
+            "alert_ratios": alerts.mean(axis=1).tolist(),
+            "alert": int(median_ratio >= self.golbal_threshold)
+        }
+
+    def sketch_bytes(self, seconds=None) -> bytes:
+        """
+        Serialized merged sketches, for combining with other processes'.
+        """
+        with self._sketch_lock:
+            return self.sketches.merged(seconds).to_bytes()
+
+    def close(self):
+        """
+        Flush buffered rows to SQLite and give up the aggregator role.
+        """
+        self.writer.close()
+        if self.aggregator is not None:
+            self.aggregator.release()
+            self.stream_buffer.close()
@@ -0,0 +1,191 @@
+import time
+
+from monitoring.metrics_queue import FEATURES
+
+# Bucket widths in seconds, and how long each level is kept (None = forever).
+# Raw predictions are never deleted by retention; they leave SQLite only
+# through the Parquet archiver (monitoring/archive.py).
+RESOLUTIONS = (1, 60, 3600)
+RETENTION_SECONDS = {
+    "metrics": 86400,
+    1: 6 * 3600,
+    60: 30 * 86400,
+    3600: None,
+}
+
+DRIFT_STATS = ("mean", "median", "std")
+FEATURE_COLUMNS = [f"{stat}_drift_{feature}" for stat in DRIFT_STATS for feature in FEATURES]
+
+# Averaged columns: merged as count-weighted means.
+AVG_COLUMNS = ["drift_avg", "mean_value_avg", "median_value_avg", "std_value_avg"] + FEATURE_COLUMNS
+MAX_COLUMNS = ["drift_max", "psi_max", "ks_max", "wasserstein_max"]
+MIN_COLUMNS = ["drift_min"]
+COLUMNS = ["resolution", "bucket", "n", "alert_count", "model_version"] + MIN_COLUMNS + MAX_COLUMNS + AVG_COLUMNS
+
+CREATE_ROLLUPS_SQL = f"""
+    CREATE TABLE IF NOT EXISTS metric_rollups (
+        resolution INTEGER NOT NULL,
+        bucket REAL NOT NULL,
+        n INTEGER NOT NULL,
+        alert_count INTEGER NOT NULL,
+        model_version TEXT,
+        {", ".join(f"{column} REAL" for column in MIN_COLUMNS + MAX_COLUMNS + AVG_COLUMNS)},
+        PRIMARY KEY (resolution, bucket)
+    ) WITHOUT ROWID
+"""
+
+# A bucket is written in parts (the open bucket on every writer flush, a
+# restart in the middle of a bucket); the upsert merges each part into the
+# row instead of overwriting it. SQLite evaluates every SET expression
+# against the old row.
+UPSERT_ROLLUP_SQL = f"""
+    INSERT INTO metric_rollups ({", ".join(COLUMNS)})
+    VALUES ({", ".join("?" for _ in COLUMNS)})
+    ON CONFLICT (resolution, bucket) DO UPDATE SET
+        n = n + excluded.n,
+        alert_count = alert_count + excluded.alert_count,
+        model_version = excluded.model_version,
+        {", ".join(f"{c} = min(coalesce({c}, excluded.{c}), coalesce(excluded.{c}, {c}))" for c in MIN_COLUMNS)},
+        {", ".join(f"{c} = max(coalesce({c}, excluded.{c}), coalesce(excluded.{c}, {c}))" for c in MAX_COLUMNS)},
+        {", ".join(f"{c} = ({c} * n + excluded.{c} * excluded.n) / (n + excluded.n)" for c in AVG_COLUMNS)}
+"""
+
+
+class _Bucket:
+
+    def __init__(self):
+        self.n = 0
+        self.alert_count = 0
+        self.model_version = None
+        self.mins = {c: None for c in MIN_COLUMNS}
+        self.maxs = {c: None for c in MAX_COLUMNS}
+        self.sums = dict.fromkeys(AVG_COLUMNS, 0.0)
+
+    def add(self, values: dict):
+        self.n += 1
+        self.alert_count += int(values["alert"])
+        self.model_version = values["model_version"]
+        for c in MIN_COLUMNS:
+            v = values[c]
+            self.mins[c] = v if self.mins[c] is None else min(self.mins[c], v)
+        for c in MAX_COLUMNS:
+            v = values[c]
+            if v is not None:
+                self.maxs[c] = v if self.maxs[c] is None else max(self.maxs[c], v)
+        for c in AVG_COLUMNS:
+            self.sums[c] += values[c]
+
+    def row(self, resolution, bucket):
+        return (
+            resolution, bucket, self.n, self.alert_count, self.model_version,
+            *self.mins.values(),
+            *self.maxs.values(),
+            *(self.sums[c] / self.n for c in AVG_COLUMNS),
+        )
+
+
+def _flatten(metric: dict) -> dict:
+    """
+    Map a metrics row (metric_row keyword arguments) onto rollup columns.
+    """
+    values = {
+        "alert": metric["alert"],
+        "model_version": metric.get("model_version"),
+        "drift_min": metric["drift_score"],
+        "drift_max": metric["drift_score"],
+        "drift_avg": metric["drift_score"],
+        "mean_value_avg": metric["mean_value"],
+        "median_value_avg": metric["median_value"],
+        "std_value_avg": metric["std_value"],
+    }
+    for stat in ("psi", "ks", "wasserstein"):
+        vals = metric.get(f"{stat}_vals")
+        values[f"{stat}_max"] = None if vals is None else max(vals)
+    for stat in DRIFT_STATS:
+        for feature, value in zip(FEATURES, metric[f"{stat}_drift_vals"]):
+            values[f"{stat}_drift_{feature}"] = value
+    return values
+
+
+class RollupAggregator:
+    """
+    Folds metrics rows into open 1s / 1m / 1h buckets in memory. A bucket's
+    row is emitted once a metric arrives for a later bucket, and
+    flush_open emits what the open buckets gathered so far, so the newest
+    bucket is readable before it closes. Each level costs one write per
+    bucket and flush instead of one per metric.
+    """
+
+    def __init__(self, resolutions=RESOLUTIONS):
+        self.resolutions = resolutions
+        self._open = {}  # resolution -> (bucket start, _Bucket)
+
+    def add(self, timestamp: float, metric: dict) -> list:
+        """
+        Account for one metric; returns the rows of any buckets it closed.
+        """
+        values = _flatten(metric)
+        closed = []
+        for resolution in self.resolutions:
+            start = float(int(timestamp // resolution) * resolution)
+            current = self._open.get(resolution)
+            if current is None or current[0] != start:
+                if current is not None and current[1].n:
+                    closed.append(current[1].row(resolution, current[0]))
+                current = self._open[resolution] = (start, _Bucket())
+            current[1].add(values)
+        return closed
+
+    def flush_open(self) -> list:
+        """
+        Rows for the metrics the open buckets gathered since the last call.
+        The buckets stay open and start again from empty, so each metric is
+        written once and the upsert merges the parts.
+        """
+        rows = []
+        for resolution, (start, bucket) in self._open.items():
+            if bucket.n:
+                rows.append(bucket.row(resolution, start))
+                self._open[resolution] = (start, _Bucket())
+        return rows
+
+    def flush_all(self) -> list:
+        rows = self.flush_open()
+        self._open.clear()
+        return rows
+
+
+def apply_retention(conn, now=None, retention=RETENTION_SECONDS) -> dict:
+    """
+    Delete raw metric rows and fine-grained rollups that are past their
+    retention. Returns the number of rows deleted per table / resolution.
+    """
+    now = time.time() if now is None else now
+    deleted = {}
+    with conn:
+        if retention.get("metrics") is not None:
+            cursor = conn.execute("DELETE FROM metrics WHERE timestamp < ?", (now - retention["metrics"],))
+            deleted["metrics"] = cursor.rowcount
+        for resolution in RESOLUTIONS:
+            if retention.get(resolution) is not None:
+                cursor = conn.execute(
+                    "DELETE FROM metric_rollups WHERE resolution = ? AND bucket < ?",
+                    (resolution, now - retention[resolution])
+                )
+                deleted[f"rollup_{resolution}s"] = cursor.rowcount
+    return deleted
+
+
+def load_rollups(conn, resolution: int, since: float = None, columns=None):
+    """
+    Rollup rows of one resolution, oldest first, as a DataFrame.
+    """
+    import pandas as pd
+
+    columns = columns or COLUMNS
+    query = f"SELECT {', '.join(columns)} FROM metric_rollups WHERE resolution = ?"
+    params = [resolution]
+    if since is not None:
+        query += " AND bucket >= ?"
+        params.append(since)
+    return pd.read_sql(query + " ORDER BY bucket ASC", conn, params=params)
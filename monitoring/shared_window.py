@@ -0,0 +1,295 @@
+import fcntl
+import os
+import sys
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from pathlib import Path
+
+import numpy as np
+
+from monitoring.histogram import WindowHistogram
+from monitoring.metrics_queue import RingBuffer
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+SHM_NAME = "streammonitor_window"
+LOCK_PATH = ROOT_DIR / "monitoring" / "window.lock"
+# Every attached process holds a shared flock on this file.
+USERS_LOCK_PATH = ROOT_DIR / "monitoring" / "window_users.lock"
+AGGREGATOR_LOCK_PATH = ROOT_DIR / "monitoring" / "aggregator.lock"
+
+_HEAD, _COUNT = 0, 1
+
+
+def _attach(name, create=False, size=0):
+    """
+    Open a segment that outlives this process. Before Python 3.13 every
+    open is registered with the resource tracker, which would unlink the
+    segment when this process exits while other workers still use it.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, create=create, size=size, track=False)
+    shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+    resource_tracker.unregister("/" + shm.name, "shared_memory")
+    return shm
+
+
+def _unlink(shm):
+    if sys.version_info < (3, 13):
+        # unlink() unregisters the name, so it has to be tracked again first.
+        resource_tracker.register("/" + shm.name, "shared_memory")
+    shm.unlink()
+
+
+def _unlink_stale(name):
+    try:
+        shm = _attach(name)
+    except FileNotFoundError:
+        return
+    shm.close()
+    _unlink(shm)
+
+
+def _try_flock(fd, operation) -> bool:
+    try:
+        fcntl.flock(fd, operation | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
+
+
+class SharedRingBuffer(RingBuffer):
+    """
+    RingBuffer whose storage lives in one shared-memory segment, so every
+    API worker process on the host appends to and reads the same window.
+
+    Segment layout (all 8-byte aligned):
+    - header:      int64 [head, count]
+    - shift:       float64 (n_features,)  fixed offset for the running sums
+    - sums:        float64 (2, n_features) running sum / sum of squares of
+                   (row - shift) over the window
+    - features:    float64 (capacity, n_features)
+    - timestamps:  float64 (capacity,)
+    - predictions: float64 (capacity,)
+
+    Writers serialize on an flock'd lock file; an append is one lock
+    round-trip plus a few row writes.
+
+    Each attached process holds a shared flock on `users_lock_path`. The
+    first process to attach when nobody else is attached unlinks any
+    segment left from an earlier run (possibly with another layout), and
+    the last one to close unlinks the segment.
+    """
+
+    def __init__(self, capacity: int, feature_names: list, shift,
+                 name=SHM_NAME, lock_path=LOCK_PATH, users_lock_path=USERS_LOCK_PATH):
+        self.maxlen = capacity
+        self.feature_names = list(feature_names)
+        n_features = len(self.feature_names)
+
+        shapes = [
+            ("header", (2,), np.int64),
+            ("shift", (n_features,), np.float64),
+            ("sums", (2, n_features), np.float64),
+            ("features", (capacity, n_features), np.float64),
+            ("timestamps", (capacity,), np.float64),
+            ("predictions", (capacity,), np.float64),
+        ]
+        size = sum(int(np.prod(shape)) * 8 for _, shape, _ in shapes)
+
+        self._lock_fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._users_fd = os.open(users_lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        # Users-lock changes happen under the window lock, so no process can
+        # see "no other users" while another is between attach steps.
+        with self.locked():
+            if _try_flock(self._users_fd, fcntl.LOCK_EX):
+                _unlink_stale(name)
+            fcntl.flock(self._users_fd, fcntl.LOCK_SH)
+            try:
+                self._shm = _attach(name, create=True, size=size)
+            except FileExistsError:
+                self._shm = _attach(name)
+        if self._shm.size < size:
+            self.close()
+            raise ValueError(f"shared window {name!r} exists with a different layout")
+
+        arrays = {}
+        offset = 0
+        for attr, shape, dtype in shapes:
+            arrays[attr] = np.ndarray(shape, dtype=dtype, buffer=self._shm.buf, offset=offset)
+            offset += int(np.prod(shape)) * 8
+
+        self._header = arrays["header"]
+        self._shift = arrays["shift"]
+        self._sums = arrays["sums"]
+        self.features = arrays["features"]
+        self.timestamps = arrays["timestamps"]
+        self.predictions = arrays["predictions"]
+
+        # Every worker passes the same shift (the baseline mean), so whoever
+        # gets here first on an empty window sets it.
+        with self.locked():
+            if self.count == 0:
+                self._shift[:] = shift
+
+    # ---------- SHARED STATE ----------
+    @property
+    def head(self):
+        return int(self._header[_HEAD])
+
+    @head.setter
+    def head(self, value):
+        self._header[_HEAD] = value
+
+    @property
+    def count(self):
+        return int(self._header[_COUNT])
+
+    @count.setter
+    def count(self, value):
+        self._header[_COUNT] = value
+
+    @contextmanager
+    def locked(self):
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    # ---------- WRITERS ----------
+    def append(self, features, prediction: float, timestamp: float):
+        row = np.asarray(features, dtype=np.float64)
+        with self.locked():
+            evicted = super().append(row, prediction, timestamp)
+            self._account(row[None, :], None if evicted is None else evicted[None, :])
+        return evicted
+
+    def extend(self, features, predictions, timestamp: float):
+        rows = np.asarray(features, dtype=np.float64)
+        with self.locked():
+            evicted = super().extend(rows, predictions, timestamp)
+            self._account(rows, evicted)
+        return evicted
+
+    def _account(self, rows, evicted):
+        deltas = rows - self._shift
+        self._sums[0] += deltas.sum(axis=0)
+        self._sums[1] += (deltas * deltas).sum(axis=0)
+        if evicted is not None:
+            deltas = evicted - self._shift
+            self._sums[0] -= deltas.sum(axis=0)
+            self._sums[1] -= (deltas * deltas).sum(axis=0)
+
+    # ---------- READERS ----------
+    def snapshot(self) -> np.ndarray:
+        """
+        Consistent copy of the window's feature rows, oldest first.
+        """
+        with self.locked():
+            return np.concatenate(self.views("features"))
+
+    def resync(self):
+        """
+        Recompute the running sums exactly from the window contents.
+        """
+        with self.locked():
+            self._sums[:] = 0.0
+            for view in self.views("features"):
+                deltas = view - self._shift
+                self._sums[0] += deltas.sum(axis=0)
+                self._sums[1] += (deltas * deltas).sum(axis=0)
+
+    def sums(self):
+        with self.locked():
+            return self.count, self._shift.copy(), self._sums.copy()
+
+    def close(self):
+        """
+        Detach; the last process attached unlinks the segment.
+        """
+        with self.locked():
+            # Drop the array views first: the mapping cannot close while
+            # numpy still exports its buffer.
+            self._header = self._shift = self._sums = None
+            self.features = self.timestamps = self.predictions = None
+            self._shm.close()
+            fcntl.flock(self._users_fd, fcntl.LOCK_UN)
+            if _try_flock(self._users_fd, fcntl.LOCK_EX):
+                _unlink(self._shm)
+                fcntl.flock(self._users_fd, fcntl.LOCK_UN)
+        os.close(self._users_fd)
+        os.close(self._lock_fd)
+
+
+class SharedWindowStats:
+    """
+    SlidingWindowStats counterpart for a SharedRingBuffer. The buffer keeps
+    the running sums itself on append, so push is a no-op; the median and
+    histogram are taken over a snapshot of the window when drift is computed.
+    """
+
+    def __init__(self, buffer: SharedRingBuffer, resync_every: int = 100, edges=None):
+        self.buffer = buffer
+        self.resync_every = resync_every
+        self._reads = 0
+        self._histogram = None if edges is None else WindowHistogram(edges)
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def push(self, row, evicted=None):
+        pass
+
+    def push_batch(self, rows, evicted=None):
+        pass
+
+    def mean(self):
+        count, shift, sums = self.buffer.sums()
+        return shift + sums[0] / count
+
+    def variance(self):
+        # Add/remove pairs accumulate rounding error across all writers;
+        # the reader (the aggregator) periodically rebuilds the sums.
+        self._reads += 1
+        if self._reads % self.resync_every == 0:
+            self.buffer.resync()
+        count, _, sums = self.buffer.sums()
+        mean_delta = sums[0] / count
+        return np.maximum(sums[1] / count - mean_delta * mean_delta, 0.0)
+
+    def median(self):
+        return np.median(self.buffer.snapshot(), axis=0)
+
+    def histogram(self):
+        return self._histogram.measure(self.buffer.snapshot())
+
+
+class AggregatorLease:
+    """
+    Elects the one worker per host that writes metrics rows: whoever holds
+    an exclusive flock on the aggregator lock file. The OS releases the
+    lock if that worker dies, and the next caller of acquire() takes over.
+    """
+
+    def __init__(self, lock_path=AGGREGATOR_LOCK_PATH):
+        self.lock_path = lock_path
+        self._fd = None
+
+    def acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
@@ -0,0 +1,233 @@
+import struct
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class TDigest:
+    """
+    Mergeable quantile sketch (merging t-digest) with bounded memory.
+
+    - update: values are buffered and folded in by a vectorized compress
+    - merge: combines another digest's centroids, so partial digests from
+      several processes or time buckets give global quantiles
+    - memory: about compression / 2 centroids, whatever the stream length
+
+    Centroids are formed with the k1 scale function
+    k(q) = compression / (2 * pi) * asin(2q - 1), which keeps clusters
+    small near the tails, where quantile error matters most.
+    """
+
+    def __init__(self, compression=100, buffer_size=None):
+        self.compression = compression
+        self.buffer_size = buffer_size or 5 * compression
+
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.count = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+        self._buffer = []
+        self._buffered = 0
+
+    def __len__(self):
+        return int(self.count + self._buffered)
+
+    # ---------- UPDATES ----------
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).reshape(-1)
+        if not len(values):
+            return
+        self._buffer.append(values)
+        self._buffered += len(values)
+        if self._buffered >= self.buffer_size:
+            self._compress()
+
+    def merge(self, other: "TDigest"):
+        other._compress()
+        if not other.count:
+            return
+        self._compress(other.means, other.weights)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def _compress(self, extra_means=None, extra_weights=None):
+        parts_m, parts_w = [self.means], [self.weights]
+        if self._buffer:
+            values = np.concatenate(self._buffer)
+            self._buffer, self._buffered = [], 0
+            self.min = min(self.min, values.min())
+            self.max = max(self.max, values.max())
+            parts_m.append(values)
+            parts_w.append(np.ones(len(values)))
+        if extra_means is not None:
+            parts_m.append(extra_means)
+            parts_w.append(extra_weights)
+        if len(parts_m) == 1:
+            return
+
+        means = np.concatenate(parts_m)
+        weights = np.concatenate(parts_w)
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+
+        total = weights.sum()
+        q_left = (np.cumsum(weights) - weights) / total
+        k = self.compression / (2 * np.pi) * np.arcsin(2 * q_left - 1)
+        group = np.floor(k)
+        starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+        self.count = total
+
+    # ---------- QUERIES ----------
+    def _knots(self):
+        self._compress()
+        centers = np.cumsum(self.weights) - self.weights / 2
+        x = np.concatenate([[0.0], centers, [self.count]])
+        y = np.concatenate([[self.min], self.means, [self.max]])
+        return x, y
+
+    def quantile(self, qs):
+        """
+        Estimated quantile(s) for q in [0, 1]; None while empty.
+        """
+        if not len(self):
+            return None
+        x, y = self._knots()
+        return np.interp(np.asarray(qs, dtype=np.float64) * self.count, x, y)
+
+    def cdf(self, values):
+        if not len(self):
+            return None
+        x, y = self._knots()
+        return np.interp(values, y, x) / self.count
+
+    # ---------- SERIALIZATION ----------
+    _HEADER = struct.Struct("<dddd q")
+
+    def to_bytes(self) -> bytes:
+        self._compress()
+        header = self._HEADER.pack(self.compression, self.count, self.min, self.max, len(self.means))
+        return header + self.means.tobytes() + self.weights.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "TDigest":
+        compression, count, lo, hi, n = cls._HEADER.unpack_from(data)
+        offset = cls._HEADER.size
+        digest = cls(compression=compression)
+        digest.means = np.frombuffer(data, dtype=np.float64, count=n, offset=offset).copy()
+        digest.weights = np.frombuffer(data, dtype=np.float64, count=n, offset=offset + 8 * n).copy()
+        digest.count, digest.min, digest.max = count, lo, hi
+        return digest
+
+
+class FeatureSketches:
+    """
+    One TDigest per feature, updated from (k, n_features) rows. Rows are
+    buffered here and handed to the digests column by column, so a
+    single-row update is one list append.
+    """
+
+    def __init__(self, n_features, compression=100):
+        self.n_features = n_features
+        self.compression = compression
+        self.digests = [TDigest(compression) for _ in range(n_features)]
+        self._rows = []
+        self._buffered = 0
+
+    def __len__(self):
+        return len(self.digests[0]) + self._buffered
+
+    def update(self, rows):
+        rows = np.atleast_2d(np.asarray(rows, dtype=np.float64))
+        self._rows.append(rows)
+        self._buffered += len(rows)
+        if self._buffered >= self.digests[0].buffer_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._rows:
+            return
+        rows = np.concatenate(self._rows)
+        self._rows, self._buffered = [], 0
+        for digest, column in zip(self.digests, rows.T):
+            digest.update(column)
+            digest._compress()
+
+    def merge(self, other: "FeatureSketches"):
+        other._flush()
+        for digest, other_digest in zip(self.digests, other.digests):
+            digest.merge(other_digest)
+
+    def quantiles(self, qs=(0.05, 0.25, 0.5, 0.75, 0.95)):
+        """
+        Returns a (len(qs), n_features) ndarray, or None while empty.
+        """
+        if not len(self):
+            return None
+        self._flush()
+        return np.column_stack([digest.quantile(qs) for digest in self.digests])
+
+    def to_bytes(self) -> bytes:
+        self._flush()
+        parts = [struct.pack("<q", self.n_features)]
+        for digest in self.digests:
+            blob = digest.to_bytes()
+            parts.append(struct.pack("<q", len(blob)))
+            parts.append(blob)
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "FeatureSketches":
+        (n_features,) = struct.unpack_from("<q", data)
+        offset = 8
+        digests = []
+        for _ in range(n_features):
+            (size,) = struct.unpack_from("<q", data, offset)
+            offset += 8
+            digests.append(TDigest.from_bytes(data[offset:offset + size]))
+            offset += size
+        sketches = cls(n_features, compression=digests[0].compression if digests else 100)
+        sketches.digests = digests
+        return sketches
+
+
+class BucketedSketches:
+    """
+    FeatureSketches per fixed time bucket, so quantiles can be asked for
+    any recent horizon (the last hour, the last day) by merging buckets.
+    Memory is bounded by max_buckets * n_features digests.
+    """
+
+    def __init__(self, n_features, bucket_seconds=300, max_buckets=288, compression=100):
+        self.n_features = n_features
+        self.bucket_seconds = bucket_seconds
+        self.max_buckets = max_buckets
+        self.compression = compression
+        self.buckets = OrderedDict()  # bucket start (unix s) -> FeatureSketches
+
+    def update(self, rows, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        start = int(timestamp // self.bucket_seconds) * self.bucket_seconds
+
+        sketches = self.buckets.get(start)
+        if sketches is None:
+            sketches = self.buckets[start] = FeatureSketches(self.n_features, self.compression)
+            while len(self.buckets) > self.max_buckets:
+                self.buckets.popitem(last=False)
+        sketches.update(rows)
+
+    def merged(self, seconds=None, now=None) -> FeatureSketches:
+        """
+        Merge every bucket overlapping the last `seconds` (all buckets if None).
+        """
+        now = time.time() if now is None else now
+        result = FeatureSketches(self.n_features, self.compression)
+        for start, sketches in self.buckets.items():
+            if seconds is None or start + self.bucket_seconds > now - seconds:
+                result.merge(sketches)
+        return result
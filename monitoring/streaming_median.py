@@ -1,3 +1,10 @@
+import heapq
+from array import array
+from bisect import bisect_left, insort
+
+import numpy as np
+
+
 class StreamingMedian:
     """
     Maintains the median of a stream using:
@@ -32,21 +39,26 @@ class StreamingMedian:
         return root
 
     def _heapify_max(self, i):
-        largest = i
-        left = 2 * i + 1
-        right = 2 * i + 2
+        n = len(self.max_heap)
 
-        if left < len(self.max_heap) and self.max_heap[left] > self.max_heap[largest]:
-            largest = left
-        if right < len(self.max_heap) and self.max_heap[right] > self.max_heap[largest]:
-            largest = right
+        while True:
+            largest = i
+            left = 2 * i + 1
+            right = 2 * i + 2
+
+            if left < n and self.max_heap[left] > self.max_heap[largest]:
+                largest = left
+            if right < n and self.max_heap[right] > self.max_heap[largest]:
+                largest = right
+
+            if largest == i:
+                break
 
-        if largest != i:
             self.max_heap[i], self.max_heap[largest] = (
                 self.max_heap[largest],
                 self.max_heap[i],
             )
-            self._heapify_max(largest)
+            i = largest
 
     # ---------- MIN HEAP HELPERS ----------
     def _insert_min(self, value):
@@ -71,21 +83,26 @@ class StreamingMedian:
         return root
 
     def _heapify_min(self, i):
-        smallest = i
-        left = 2 * i + 1
-        right = 2 * i + 2
+        n = len(self.min_heap)
 
-        if left < len(self.min_heap) and self.min_heap[left] < self.min_heap[smallest]:
-            smallest = left
-        if right < len(self.min_heap) and self.min_heap[right] < self.min_heap[smallest]:
-            smallest = right
+        while True:
+            smallest = i
+            left = 2 * i + 1
+            right = 2 * i + 2
+
+            if left < n and self.min_heap[left] < self.min_heap[smallest]:
+                smallest = left
+            if right < n and self.min_heap[right] < self.min_heap[smallest]:
+                smallest = right
+
+            if smallest == i:
+                break
 
-        if smallest != i:
             self.min_heap[i], self.min_heap[smallest] = (
                 self.min_heap[smallest],
                 self.min_heap[i],
             )
-            self._heapify_min(smallest)
+            i = smallest
 
     # ---------- PUBLIC API ----------
     def insert(self, value):
@@ -118,3 +135,247 @@ class StreamingMedian:
             return self.max_heap[0]
 
         return self.min_heap[0]
+
+
+class SlidingWindowMedian:
+    """
+    Maintains the median of a sliding window using:
+    - Max Heap for lower half
+    - Min Heap for upper half
+    - Lazy deletion for values that left the window
+    """
+
+    def __init__(self):
+        self.max_heap = []  # lower half (negated values)
+        self.min_heap = []  # upper half
+        self.delayed = {}   # value -> pending removals
+        self.max_size = 0   # live values in max_heap
+        self.min_size = 0   # live values in min_heap
+
+    # ---------- LAZY DELETION HELPERS ----------
+    def _prune(self, heap, sign):
+        while heap:
+            value = sign * heap[0]
+            count = self.delayed.get(value)
+            if not count:
+                break
+            if count == 1:
+                del self.delayed[value]
+            else:
+                self.delayed[value] = count - 1
+            heapq.heappop(heap)
+
+    def _balance(self):
+        if self.max_size > self.min_size + 1:
+            heapq.heappush(self.min_heap, -heapq.heappop(self.max_heap))
+            self.max_size -= 1
+            self.min_size += 1
+            self._prune(self.max_heap, -1)
+        elif self.max_size < self.min_size:
+            heapq.heappush(self.max_heap, -heapq.heappop(self.min_heap))
+            self.min_size -= 1
+            self.max_size += 1
+            self._prune(self.min_heap, 1)
+
+    # ---------- PUBLIC API ----------
+    def __len__(self):
+        return self.max_size + self.min_size
+
+    def insert(self, value):
+        """
+        Insert value into window
+        Time complexity: O(log n)
+        """
+        if not self.max_heap or value <= -self.max_heap[0]:
+            heapq.heappush(self.max_heap, -value)
+            self.max_size += 1
+        else:
+            heapq.heappush(self.min_heap, value)
+            self.min_size += 1
+        self._balance()
+
+    def remove(self, value):
+        """
+        Remove a value previously inserted into the window
+        Time complexity: amortized O(log n)
+        """
+        self.delayed[value] = self.delayed.get(value, 0) + 1
+
+        if value <= -self.max_heap[0]:
+            self.max_size -= 1
+            if value == -self.max_heap[0]:
+                self._prune(self.max_heap, -1)
+        else:
+            self.min_size -= 1
+            if self.min_heap and value == self.min_heap[0]:
+                self._prune(self.min_heap, 1)
+        self._balance()
+
+    def get_median(self):
+        """
+        Returns current median
+        Time complexity: O(1)
+        """
+        if not len(self):
+            return None
+        if self.max_size > self.min_size:
+            return -self.max_heap[0]
+        return (-self.max_heap[0] + self.min_heap[0]) / 2
+
+
+class SlidingWindowQuantiles:
+    """
+    Maintains arbitrary quantiles of a sliding window using:
+    - A sorted, contiguous array of doubles
+    - Binary search to locate inserts and removals
+    """
+
+    def __init__(self):
+        self.values = array("d")  # sorted window contents
+
+    # ---------- PUBLIC API ----------
+    def __len__(self):
+        return len(self.values)
+
+    def insert(self, value):
+        """
+        Insert value into window
+        Time complexity: O(log n) search + O(n) memmove
+        """
+        insort(self.values, value)
+
+    def remove(self, value):
+        """
+        Remove a value previously inserted into the window
+        Time complexity: O(log n) search + O(n) memmove
+        """
+        i = bisect_left(self.values, value)
+        if i == len(self.values) or self.values[i] != value:
+            raise ValueError(f"{value!r} is not in the window")
+        del self.values[i]
+
+    def get_quantile(self, q):
+        """
+        Returns the q-th quantile (0 <= q <= 1), linearly interpolated
+        Time complexity: O(1)
+        """
+        n = len(self.values)
+        if not n:
+            return None
+
+        position = q * (n - 1)
+        lower = int(position)
+        upper = min(lower + 1, n - 1)
+        fraction = position - lower
+        return self.values[lower] + (self.values[upper] - self.values[lower]) * fraction
+
+    def get_quantiles(self, qs=(0.05, 0.25, 0.5, 0.75, 0.95)):
+        return [self.get_quantile(q) for q in qs]
+
+    def get_median(self):
+        """
+        Returns current median
+        Time complexity: O(1)
+        """
+        n = len(self.values)
+        if not n:
+            return None
+        mid = n // 2
+        if n % 2:
+            return self.values[mid]
+        return (self.values[mid - 1] + self.values[mid]) / 2
+
+
+class MultiFeatureStreamingMedian:
+    """
+    Maintains medians and quantiles of several features at once using:
+    - One sorted row per feature in a preallocated (n_features, capacity) matrix
+    - NumPy searchsorted / block moves, so no Python loop runs per value
+    """
+
+    def __init__(self, n_features, capacity):
+        self.n_features = n_features
+        self.capacity = capacity
+        self.sorted = np.empty((n_features, capacity), dtype=np.float64)
+        self.count = 0
+
+    # ---------- PUBLIC API ----------
+    def __len__(self):
+        return self.count
+
+    def insert(self, rows):
+        """
+        Insert one feature row (n_features,) or a batch (k, n_features)
+        Time complexity: O(features * (k log n + n)) with NumPy block moves
+        """
+        rows = np.atleast_2d(np.asarray(rows, dtype=np.float64))
+        n, k = self.count, len(rows)
+        if n + k > self.capacity:
+            raise ValueError(f"inserting {k} rows would exceed capacity {self.capacity}")
+
+        for column, values in zip(self.sorted, rows.T):
+            if k == 1:
+                i = column[:n].searchsorted(values[0], side="right")
+                column[i + 1:n + 1] = column[i:n]
+                column[i] = values[0]
+            else:
+                values = np.sort(values)
+                positions = column[:n].searchsorted(values, side="right")
+                column[:n + k] = np.insert(column[:n], positions, values)
+
+        self.count += k
+
+    def remove(self, rows):
+        """
+        Remove one feature row (n_features,) or a batch (k, n_features)
+        previously inserted
+        """
+        rows = np.atleast_2d(np.asarray(rows, dtype=np.float64))
+        n, k = self.count, len(rows)
+        if k > n:
+            raise ValueError(f"cannot remove {k} rows from {n}")
+
+        for column, values in zip(self.sorted, rows.T):
+            if k == 1:
+                i = column[:n].searchsorted(values[0])
+                if i == n or column[i] != values[0]:
+                    raise ValueError(f"{values[0]!r} is not in the window")
+                column[i:n - 1] = column[i + 1:n]
+            else:
+                values = np.sort(values)
+                # Duplicates in the batch must map to distinct slots.
+                positions = column[:n].searchsorted(values)
+                positions += np.arange(k) - np.searchsorted(values, values)
+                if positions.max() >= n or np.any(column[positions] != values):
+                    raise ValueError("batch contains values that are not in the window")
+                column[:n - k] = np.delete(column[:n], positions)
+
+        self.count -= k
+
+    def get_median(self):
+        """
+        Returns the median of every feature as an ndarray
+        Time complexity: O(features)
+        """
+        n = self.count
+        if not n:
+            return None
+        mid = n // 2
+        if n % 2:
+            return self.sorted[:, mid].copy()
+        return (self.sorted[:, mid - 1] + self.sorted[:, mid]) / 2
+
+    def get_quantiles(self, qs=(0.05, 0.25, 0.5, 0.75, 0.95)):
+        """
+        Returns a (len(qs), n_features) ndarray of linearly interpolated quantiles
+        """
+        n = self.count
+        if not n:
+            return None
+
+        position = np.asarray(qs, dtype=np.float64) * (n - 1)
+        lower = position.astype(np.intp)
+        upper = np.minimum(lower + 1, n - 1)
+        fraction = (position - lower)[:, None]
+        low = self.sorted[:, lower].T
+        return low + (self.sorted[:, upper].T - low) * fraction
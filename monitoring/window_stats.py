@@ -0,0 +1,137 @@
+import numpy as np
+
+from monitoring.histogram import WindowHistogram
+from monitoring.streaming_median import MultiFeatureStreamingMedian
+
+
+def check_finite(rows):
+    """
+    Raise ValueError if any feature value is NaN or infinite. One such row
+    would leave the running sums NaN and could never be found again in
+    the sorted median columns to be evicted.
+    """
+    if not np.isfinite(rows).all():
+        raise ValueError("window rows must be finite")
+
+
+class SlidingWindowStats:
+    """
+    Maintains per-feature mean, variance and median over the window held
+    by a RingBuffer.
+
+    - push: one vectorized update across all features, removing the row
+      the buffer evicted (if any)
+    - mean / variance / median: O(features)
+    - histogram: per-feature counts over fixed bins (when edges are given)
+    """
+
+    def __init__(self, buffer, edges=None):
+        self.buffer = buffer
+        self.n_features = buffer.features.shape[1]
+        self.count = 0
+
+        # Sums are kept relative to a shift value (the first row seen) so
+        # that sum / sum of squares stay well conditioned for large features.
+        self._shift = None
+        self._sum = np.zeros(self.n_features)
+        self._sumsq = np.zeros(self.n_features)
+        self._evictions = 0
+
+        self._medians = MultiFeatureStreamingMedian(self.n_features, buffer.maxlen)
+        self._histogram = None if edges is None else WindowHistogram(edges)
+
+    def __len__(self):
+        return self.count
+
+    def push(self, row, evicted=None):
+        """
+        Account for a row appended to the buffer and the row it evicted.
+        """
+        row = np.asarray(row, dtype=np.float64)
+        check_finite(row)
+        if self._shift is None:
+            self._shift = row.copy()
+
+        if evicted is not None:
+            self._evict(evicted)
+        else:
+            self.count += 1
+
+        delta = row - self._shift
+        self._sum += delta
+        self._sumsq += delta * delta
+        self._medians.insert(row)
+        if self._histogram is not None:
+            self._histogram.add(row)
+
+        # Add/remove pairs accumulate rounding error; rebuild the running
+        # sums from the buffer once per full window turnover.
+        if self._evictions >= self.buffer.maxlen:
+            self._evictions = 0
+            self._resync()
+
+    def push_batch(self, rows, evicted=None):
+        """
+        Account for a (k, n_features) batch appended to the buffer and the
+        rows it evicted.
+        """
+        rows = np.asarray(rows, dtype=np.float64)
+        check_finite(rows)
+        if self._shift is None:
+            self._shift = rows[0].copy()
+
+        if evicted is not None and len(evicted):
+            self._evict(evicted)
+        self.count += len(rows) - (0 if evicted is None else len(evicted))
+
+        deltas = rows - self._shift
+        self._sum += deltas.sum(axis=0)
+        self._sumsq += (deltas * deltas).sum(axis=0)
+        self._medians.insert(rows)
+        if self._histogram is not None:
+            self._histogram.add(rows)
+
+        if self._evictions >= self.buffer.maxlen:
+            self._evictions = 0
+            self._resync()
+
+    def _evict(self, rows):
+        deltas = np.atleast_2d(rows - self._shift)
+        self._sum -= deltas.sum(axis=0)
+        self._sumsq -= (deltas * deltas).sum(axis=0)
+        self._medians.remove(rows)
+        if self._histogram is not None:
+            self._histogram.remove(rows)
+        self._evictions += len(deltas)
+
+    def _resync(self):
+        self._sum = np.zeros(self.n_features)
+        self._sumsq = np.zeros(self.n_features)
+        if self._histogram is not None:
+            self._histogram.reset()
+        for view in self.buffer.views("features"):
+            deltas = view - self._shift
+            self._sum += deltas.sum(axis=0)
+            self._sumsq += (deltas * deltas).sum(axis=0)
+            if self._histogram is not None and len(view):
+                self._histogram.add(view)
+
+    # ---------- READERS ----------
+    def mean(self):
+        return self._shift + self._sum / self.count
+
+    def variance(self):
+        mean_delta = self._sum / self.count
+        return np.maximum(self._sumsq / self.count - mean_delta * mean_delta, 0.0)
+
+    def median(self):
+        return self._medians.get_median()
+
+    def quantiles(self, qs=(0.05, 0.25, 0.5, 0.75, 0.95)):
+        return self._medians.get_quantiles(qs)
+
+    def histogram(self):
+        """
+        (counts, tail_excess) of the window; see WindowHistogram.
+        """
+        return self._histogram.counts, self._histogram.tail_excess
@@ -0,0 +1,202 @@
+import asyncio
+import queue
+import threading
+import time
+
+DROP_POLICIES = ("block", "drop_newest", "drop_oldest")
+
+_STOP = object()
+
+
+class MonitoringWorker:
+    """
+    Runs MetricsProcessor off the request path.
+
+    Prediction events go into a bounded queue and are consumed by a single
+    background thread, which ingests every event and recomputes drift every
+    `drift_every_n` events or every `drift_every_ms` milliseconds, whichever
+    comes first.
+
+    When the queue is full, `drop_policy` decides what happens:
+    - "block":       the producer waits for space (up to `block_timeout` seconds)
+    - "drop_newest": the incoming event is discarded
+    - "drop_oldest": the oldest queued event is discarded to make room
+    """
+
+    def __init__(self, processor, max_queue=10000, drift_every_n=100,
+                 drift_every_ms=1000, drop_policy="drop_oldest", block_timeout=0.05):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"drop_policy must be one of {DROP_POLICIES}, got {drop_policy!r}")
+
+        self.processor = processor
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.drift_every_n = drift_every_n
+        self.drift_every_s = drift_every_ms / 1000
+        self.drop_policy = drop_policy
+        self.block_timeout = block_timeout
+
+        self.submitted = 0
+        self.processed = 0
+        self.dropped = 0
+        self.drift_runs = 0
+
+        self._thread = None
+        self._stopping = False
+        # submitted / dropped are updated from every request thread.
+        self._count_lock = threading.Lock()
+
+    # ---------- PRODUCER SIDE ----------
+    def submit(self, features: dict, prediction: float, request_id: str,
+               model_version: str = None) -> bool:
+        """
+        Enqueue one prediction event. Returns False if it was dropped.
+        """
+        args = (features, prediction, request_id, model_version)
+        return self._put((self.processor.ingest, args, 1))
+
+    def submit_batch(self, features: list, predictions: list, request_ids: list,
+                     model_version: str = None) -> bool:
+        """
+        Enqueue a batch of prediction events as a single queue item.
+        Returns False if it was dropped.
+        """
+        args = (features, predictions, request_ids, model_version)
+        return self._put((self.processor.ingest_batch, args, len(features)))
+
+    async def submit_async(self, features: dict, prediction: float, request_id: str,
+                           model_version: str = None) -> bool:
+        """
+        submit() for async handlers. Never blocks the event loop: with the
+        "block" policy the wait for queue space happens on a thread.
+        """
+        if self.drop_policy == "block":
+            return await asyncio.to_thread(self.submit, features, prediction, request_id, model_version)
+        return self.submit(features, prediction, request_id, model_version)
+
+    async def submit_batch_async(self, features, predictions: list, request_ids: list,
+                                 model_version: str = None) -> bool:
+        """
+        submit_batch() for async handlers; see submit_async().
+        """
+        if self.drop_policy == "block":
+            return await asyncio.to_thread(self.submit_batch, features, predictions, request_ids, model_version)
+        return self.submit_batch(features, predictions, request_ids, model_version)
+
+    def _count(self, submitted=0, dropped=0):
+        with self._count_lock:
+            self.submitted += submitted
+            self.dropped += dropped
+
+    def _put(self, event) -> bool:
+        n = event[2]
+        self._count(submitted=n)
+        if self._stopping:
+            self._count(dropped=n)
+            return False
+
+        if self.drop_policy == "block":
+            try:
+                self.queue.put(event, timeout=self.block_timeout)
+                return True
+            except queue.Full:
+                self._count(dropped=n)
+                return False
+
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except queue.Full:
+            pass
+
+        if self.drop_policy == "drop_oldest":
+            try:
+                oldest = self.queue.get_nowait()
+            except queue.Empty:
+                oldest = None
+            if oldest is _STOP:
+                # stop() is draining the queue: keep its sentinel, refuse the event.
+                self.queue.put(_STOP)
+            else:
+                if oldest is not None:
+                    self._count(dropped=oldest[2])
+                try:
+                    self.queue.put_nowait(event)
+                    return True
+                except queue.Full:
+                    pass
+
+        self._count(dropped=n)
+        return False
+
+    # ---------- LIFECYCLE ----------
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="monitoring-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Drain every queued event, run a final drift computation and stop.
+        """
+        if self._thread is None:
+            return
+        # New events are refused from here on. The sentinel is queued
+        # behind pending events, so they drain first.
+        self._stopping = True
+        self.queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue.qsize(),
+            "queue_capacity": self.queue.maxsize,
+            "submitted": self.submitted,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "drift_runs": self.drift_runs,
+        }
+
+    # ---------- CONSUMER SIDE ----------
+    def _run(self):
+        pending = 0
+        last_drift = time.monotonic()
+        # A shared window is also fed by other processes, so the aggregator
+        # must keep its time-based cadence even when its own queue is idle.
+        shared = getattr(self.processor, "aggregator", None) is not None
+
+        while True:
+            timeout = max(self.drift_every_s - (time.monotonic() - last_drift), 0)
+            try:
+                event = self.queue.get(timeout=timeout if pending or shared else None)
+            except queue.Empty:
+                event = None
+
+            if event is _STOP:
+                if pending:
+                    self._compute()
+                return
+
+            if event is not None:
+                handler, args, n = event
+                try:
+                    handler(*args)
+                except Exception as exc:
+                    print(f"Monitoring ingest failed: {exc}")
+                self.processed += n
+                pending += n
+
+            due = time.monotonic() - last_drift >= self.drift_every_s
+            if pending >= self.drift_every_n or (due and (pending or shared)):
+                self._compute()
+                pending = 0
+                last_drift = time.monotonic()
+
+    def _compute(self):
+        try:
+            self.processor.compute_metrics()
+        except Exception as exc:
+            print(f"Monitoring drift computation failed: {exc}")
+        self.drift_runs += 1
@@ -0,0 +1,35 @@
+"""
+Move predictions older than --older-than-hours from monitoring.db into
+hourly Parquet partitions (monitoring/archive/predictions/hour=YYYYMMDDHH/),
+the same export the API runs in the background with STREAMMONITOR_ARCHIVE=1.
+"""
+
+import argparse
+import sqlite3
+import time
+
+from monitoring.archive import ARCHIVE_AFTER_SECONDS, ARCHIVE_DIR, archive_predictions
+from monitoring.db import DB_PATH, init_db
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--older-than-hours", type=float, default=ARCHIVE_AFTER_SECONDS / 3600)
+    parser.add_argument("--archive-dir", default=str(ARCHIVE_DIR))
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    args = parser.parse_args()
+
+    init_db()
+    conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+    start = time.perf_counter()
+    archived = archive_predictions(
+        conn, args.archive_dir, time.time() - args.older_than_hours * 3600, args.chunk_size
+    )
+    remaining = conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+    conn.close()
+    print(f"Archived {archived} predictions in {time.perf_counter() - start:.1f}s "
+          f"({remaining} left in SQLite); run scripts/compact_db.py to shrink the file")
+
+
+if __name__ == "__main__":
+    main()
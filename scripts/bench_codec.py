@@ -0,0 +1,75 @@
+"""
+Per-row request decode + response encode cost: the pydantic schema path
+(/predict, /predict/batch) vs api.codec (/fast/predict...), JSON and
+octet-stream. Serialization only; the model is not called.
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime
+
+import numpy as np
+
+from api.codec import JSON, OCTET_STREAM, decode_rows, encode_json, encode_predictions, orjson
+from api.schemas import BatchPredictionRequest, BatchPredictionResponse, PredictionResponse
+
+FEATURES = [f"feature{i}" for i in range(1, 9)]
+
+
+def per_row_us(fn, n_rows, min_seconds=0.5):
+    fn()
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_seconds:
+        fn()
+        calls += 1
+    return (time.perf_counter() - start) / calls / n_rows * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-sizes", default="1,100,1000")
+    args = parser.parse_args()
+
+    print(f"orjson: {'yes' if orjson is not None else 'no (stdlib json)'}")
+    print(f"{'rows':>6} {'pydantic':>10} {'json':>10} {'octet':>10}  (µs per row)")
+    rng = np.random.default_rng(0)
+    for n in map(int, args.batch_sizes.split(",")):
+        rows = rng.normal(size=(n, 8))
+        predictions = rng.normal(size=n)
+        ids = [f"req-{i}" for i in range(n)]
+
+        schema_body = json.dumps({"items": [
+            {**dict(zip(FEATURES, row)), "request_id": rid} for row, rid in zip(rows.tolist(), ids)
+        ]}).encode()
+        json_body = json.dumps(rows.tolist()).encode()
+        octet_body = rows.tobytes()
+
+        def schema_path():
+            batch = BatchPredictionRequest.model_validate_json(schema_body)
+            np.array([[getattr(item, f) for f in FEATURES] for item in batch.items])
+            BatchPredictionResponse(predictions=[
+                PredictionResponse(prediction=p, request_id=item.request_id,
+                                   timestamp=datetime.now(), model_version="v1")
+                for p, item in zip(predictions.tolist(), batch.items)
+            ]).model_dump_json()
+
+        def json_path():
+            decode_rows(json_body, JSON)
+            now = time.time()
+            encode_json({"predictions": [
+                {"prediction": p, "request_id": rid, "timestamp": now, "model_version": "v1"}
+                for p, rid in zip(predictions.tolist(), ids)
+            ]})
+
+        def octet_path():
+            decode_rows(octet_body, OCTET_STREAM)
+            encode_predictions(predictions)
+
+        print(f"{n:>6} {per_row_us(schema_path, n):>10.2f} "
+              f"{per_row_us(json_path, n):>10.2f} {per_row_us(octet_path, n):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Micro-benchmark of drift computation over a full window.
+
+- pandas: the previous backend_ops path (DataFrame from the buffered
+  dicts, per-column StreamingMedian, list-comprehension drift and alerts)
+- kernel: monitoring.drift.drift_kernel on a (window, n_features) array
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from monitoring.drift import baseline_matrix, drift_kernel
+from monitoring.streaming_median import StreamingMedian
+
+THRESHOLD = 0.3
+
+
+def pandas_path(buffer, baseline_mean, baseline_median, baseline_var):
+    streaming_df = pd.DataFrame([item["features"] for item in buffer])
+
+    streaming_mean, streaming_median, streaming_var = [], [], []
+    for col in streaming_df.columns:
+        values = streaming_df[col].values
+        sm = StreamingMedian()
+        for v in values:
+            sm.insert(v)
+        streaming_mean.append(values.mean())
+        streaming_median.append(sm.get_median())
+        streaming_var.append(values.var(ddof=0))
+
+    results = []
+    for baseline, streaming in (
+        (baseline_mean, streaming_mean),
+        (baseline_median, streaming_median),
+        (baseline_var, streaming_var),
+    ):
+        drift = [abs(b - s) for b, s in zip(baseline, streaming)]
+        alerts = [d > THRESHOLD for d in drift]
+        results.append((drift, sum(alerts) / len(alerts)))
+    return results
+
+
+def timed(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--window", type=int, default=10_000)
+    parser.add_argument("--features", type=int, default=8)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    window = rng.normal(size=(args.window, args.features))
+    names = [f"feature{i}" for i in range(1, args.features + 1)]
+    buffer = [{"features": dict(zip(names, row))} for row in window.tolist()]
+
+    baseline_mean = np.zeros(args.features)
+    baseline_median = np.zeros(args.features)
+    baseline_var = np.ones(args.features)
+    baseline = baseline_matrix(baseline_mean, baseline_median, baseline_var)
+
+    old = timed(lambda: pandas_path(buffer, baseline_mean, baseline_median, baseline_var), args.repeats)
+    new = timed(lambda: drift_kernel(window, baseline, THRESHOLD, THRESHOLD), args.repeats * 20)
+
+    print(f"window={args.window} features={args.features}")
+    print(f"pandas path : {old * 1e3:9.3f} ms")
+    print(f"numpy kernel: {new * 1e3:9.3f} ms  ({old / new:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
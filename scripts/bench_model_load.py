@@ -0,0 +1,79 @@
+"""
+Startup benchmark for api.load_model.ModelStore.
+
+Each configuration runs in a fresh process (as a uvicorn worker would) and
+reports load time, time to first prediction and resident memory. With
+--workers N, N processes load the model at the same time so shared
+(memory-mapped) pages show up as a lower proportional set size (PSS).
+"""
+
+import argparse
+import multiprocessing
+import time
+
+
+def _smaps_rollup() -> dict:
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            fields = {}
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3 and parts[1].isdigit():
+                    fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+            return fields
+    except OSError:
+        return {}
+
+
+def _worker(mmap_mode, barrier, results):
+    start = time.perf_counter()
+
+    import numpy as np
+    from api.load_model import MODEL_PATH, ModelStore, rss_bytes
+
+    store = ModelStore(MODEL_PATH, mmap_mode=mmap_mode)
+    store.get()
+    store.get().predict(np.zeros((1, 8)))
+    first_prediction = time.perf_counter() - start
+
+    # Measure while every worker still holds its model.
+    barrier.wait()
+    rollup = _smaps_rollup()
+    results.put({
+        "load_s": store.load_seconds,
+        "first_prediction_s": first_prediction,
+        "rss_mb": rss_bytes() / 2**20,
+        "pss_mb": rollup.get("Pss", 0) / 2**20,
+    })
+    barrier.wait()
+
+
+def run(mmap_mode, workers):
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    processes = [ctx.Process(target=_worker, args=(mmap_mode, barrier, results)) for _ in range(workers)]
+    for p in processes:
+        p.start()
+    rows = [results.get() for _ in processes]
+    for p in processes:
+        p.join()
+    return {key: sum(r[key] for r in rows) / len(rows) for key in rows[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    print(f"{'mmap_mode':>9} | {'load s':>7} | {'first pred s':>12} | {'RSS MB':>8} | {'PSS MB':>8}   (mean of {args.workers} workers)")
+    for mmap_mode in (None, "r"):
+        r = run(mmap_mode, args.workers)
+        print(
+            f"{str(mmap_mode):>9} | {r['load_s']:7.2f} | {r['first_prediction_s']:12.2f} | "
+            f"{r['rss_mb']:8.1f} | {r['pss_mb']:8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
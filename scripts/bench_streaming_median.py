@@ -0,0 +1,67 @@
+"""
+Benchmark the median structures in monitoring/streaming_median.py.
+
+For each window size the window is filled first, then every structure
+slides it forward (insert the new value, drop the oldest, read the median).
+StreamingMedian cannot drop values, so its per-op cost is the cost of the
+old processor behaviour: rebuilding the structure over the whole window.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from monitoring.streaming_median import (
+    SlidingWindowMedian,
+    SlidingWindowQuantiles,
+    StreamingMedian,
+)
+
+WINDOW_SIZES = [1_000, 10_000, 100_000]
+
+
+def bench_rebuild(values, window, steps):
+    start = time.perf_counter()
+    for step in range(steps):
+        sm = StreamingMedian()
+        for v in values[step:step + window]:
+            sm.insert(v)
+        sm.get_median()
+    return (time.perf_counter() - start) / steps
+
+
+def bench_sliding(cls, values, window, steps):
+    structure = cls()
+    for v in values[:window]:
+        structure.insert(v)
+
+    start = time.perf_counter()
+    for step in range(steps):
+        structure.insert(values[window + step])
+        structure.remove(values[step])
+        structure.get_median()
+    return (time.perf_counter() - start) / steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--steps", type=int, default=2_000, help="window slides per sliding structure")
+    parser.add_argument("--rebuild-steps", type=int, default=3, help="full rebuilds for StreamingMedian")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+
+    print(f"{'window':>8} | {'StreamingMedian (rebuild)':>26} | {'SlidingWindowMedian':>20} | {'SlidingWindowQuantiles':>23}")
+    for window in WINDOW_SIZES:
+        values = rng.normal(size=window + args.steps).tolist()
+        rebuild = bench_rebuild(values, window, args.rebuild_steps)
+        heaps = bench_sliding(SlidingWindowMedian, values, window, args.steps)
+        sorted_array = bench_sliding(SlidingWindowQuantiles, values, window, args.steps)
+        print(
+            f"{window:>8} | {rebuild * 1e6:>23.1f} us | {heaps * 1e6:>17.2f} us | {sorted_array * 1e6:>20.2f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Compare throughput of the sync (/predict) and async (/v2/predict) endpoints.
+
+Start the API first, once per configuration to compare:
+
+    uvicorn api.main:app --port 8000 --workers 1
+    uvicorn api.main:app --port 8000 --workers 4
+
+then run:
+
+    python -m scripts.bench_sync_async --url http://127.0.0.1:8000 --concurrency 64
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+ENDPOINTS = {
+    "sync": "/predict/{request_id}",
+    "async": "/v2/predict/{request_id}",
+}
+
+
+def make_payload(rng):
+    return {f"feature{i}": float(v) for i, v in enumerate(rng.normal(size=8), start=1)}
+
+
+def run(base_url, path, requests_total, concurrency):
+    rng = np.random.default_rng(0)
+    payloads = [make_payload(rng) for _ in range(requests_total)]
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+
+    def send(i):
+        start = time.perf_counter()
+        response = session.post(base_url + path.format(request_id=f"bench-{i}"), json=payloads[i])
+        response.raise_for_status()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = np.array(list(pool.map(send, range(requests_total))))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "rps": requests_total / elapsed,
+        "p50_ms": np.percentile(latencies, 50) * 1e3,
+        "p99_ms": np.percentile(latencies, 99) * 1e3,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    for name, path in ENDPOINTS.items():
+        result = run(args.url, path, args.requests, args.concurrency)
+        print(
+            f"{name:>5}: {result['rps']:8.1f} req/s | "
+            f"p50 {result['p50_ms']:7.2f} ms | p99 {result['p99_ms']:7.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
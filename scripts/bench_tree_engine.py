@@ -0,0 +1,55 @@
+"""
+Latency of sklearn's RandomForestRegressor.predict vs api.tree_engine.CompiledForest
+on the served model, per batch size. Also re-checks bit-equality.
+"""
+
+import argparse
+import time
+import warnings
+
+import joblib
+import numpy as np
+
+from api.load_model import MODEL_PATH, N_FEATURES
+from api.tree_engine import CompiledForest, verify_compiled
+
+
+def per_row_us(fn, X, min_seconds=0.5):
+    fn(X)
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_seconds:
+        fn(X)
+        calls += 1
+    return (time.perf_counter() - start) / calls / len(X) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default=str(MODEL_PATH))
+    parser.add_argument("--batch-sizes", default="1,8,32,64,1000")
+    args = parser.parse_args()
+
+    # The forest was fitted on a DataFrame; arrays trigger a name warning.
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+    forest = joblib.load(args.model)
+    start = time.perf_counter()
+    compiled = CompiledForest(forest)
+    print(f"compiled {compiled.n_trees} trees / {compiled.n_nodes} nodes "
+          f"(max depth {compiled.max_depth}) in {time.perf_counter() - start:.2f}s")
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(2, 2, size=(max(int(b) for b in args.batch_sizes.split(",")), N_FEATURES))
+    print(f"bit-equal: {verify_compiled(compiled, forest) and verify_compiled(compiled, forest, X)}")
+
+    print(f"{'batch':>6} | {'sklearn us/row':>14} | {'compiled us/row':>15} | speedup")
+    for batch in (int(b) for b in args.batch_sizes.split(",")):
+        rows = X[:batch]
+        old = per_row_us(forest.predict, rows)
+        new = per_row_us(compiled.predict, rows)
+        print(f"{batch:>6} | {old:14.1f} | {new:15.1f} | {old / new:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""
+Rebuild models/baseline_profile.npz from the training data without
+retraining the model, e.g. after the profile layout changed. The API
+only loads the profile; it never fetches the training data itself.
+"""
+
+import argparse
+
+from sklearn.datasets import fetch_california_housing
+
+from monitoring.baseline import BASELINE_PATH, build_baseline_profile, save_baseline_profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--output", default=str(BASELINE_PATH))
+    args = parser.parse_args()
+
+    data = fetch_california_housing()
+    save_baseline_profile(build_baseline_profile(data.data), args.output)
+    print(f"Baseline profile written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Apply retention to monitoring.db and reclaim the freed space.
+
+--backfill builds the rollup table from the raw metrics in the database,
+for databases written before rollups existed (the table must be empty).
+"""
+
+import argparse
+import sqlite3
+
+from monitoring.db import DB_PATH, METRIC_FEATURE_COLUMNS, METRIC_FEATURE_STATS, init_db
+from monitoring.metrics_queue import FEATURES
+from monitoring.rollups import UPSERT_ROLLUP_SQL, RollupAggregator, apply_retention
+
+
+def backfill(conn, chunk_size=10000):
+    aggregator = RollupAggregator()
+    n = len(FEATURES)
+    cursor = conn.execute(
+        f"""
+        SELECT timestamp, median_value, mean_value, std_value, drift_score, alert, model_version,
+               {", ".join(METRIC_FEATURE_COLUMNS)}
+        FROM metrics ORDER BY timestamp ASC
+        """
+    )
+    written = 0
+    while rows := cursor.fetchmany(chunk_size):
+        closed = []
+        for timestamp, median_value, mean_value, std_value, drift_score, alert, model_version, *per_feature in rows:
+            metric = {
+                "median_value": median_value,
+                "mean_value": mean_value,
+                "std_value": std_value,
+                "drift_score": drift_score,
+                "alert": alert,
+                "model_version": model_version,
+            }
+            for i, stat in enumerate(METRIC_FEATURE_STATS):
+                vals = per_feature[i * n:(i + 1) * n]
+                metric[f"{stat}_vals"] = None if vals[0] is None else vals
+            closed.extend(aggregator.add(timestamp, metric))
+        with conn:
+            conn.executemany(UPSERT_ROLLUP_SQL, closed)
+        written += len(closed)
+    with conn:
+        closed = aggregator.flush_all()
+        conn.executemany(UPSERT_ROLLUP_SQL, closed)
+    return written + len(closed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backfill", action="store_true")
+    parser.add_argument("--no-vacuum", action="store_true")
+    args = parser.parse_args()
+
+    init_db()
+    conn = sqlite3.connect(DB_PATH)
+    if args.backfill:
+        if conn.execute("SELECT COUNT(*) FROM metric_rollups").fetchone()[0]:
+            raise SystemExit("metric_rollups is not empty; backfill would double count")
+        print(f"Backfilled {backfill(conn)} rollup rows")
+
+    print(f"Deleted: {apply_retention(conn)}")
+    if not args.no_vacuum:
+        conn.execute("VACUUM")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,343 @@
 """
-Load testing script to simulate data drift.
+Load generator and latency benchmark for the prediction API.
 
-- First 500 requests: baseline distribution
-- Last 500 requests: shifted distribution
+Requests follow an open-loop arrival schedule at --qps (uniform or
+Poisson), so a slow server does not slow the load down. Latency is
+measured from each request's scheduled send time, which includes any
+queueing in the client. With --qps 0 the run is closed-loop instead:
+--concurrency workers send back to back.
+
+Feature rows are N(0, 1), plus a shift that follows --drift. For
+example, "0:0,0.5:2" means no shift for the first half of the run and
++2.0 after it. Every request gets a unique request_id.
+
+Against a running server:
+
+    uvicorn api.main:app --port 8000
+    python -m scripts.load_test --url http://127.0.0.1:8000 --qps 500 --duration 30
+
+In-process, through httpx.ASGITransport with no network (the app's
+lifespan runs inside this process):
+
+    python -m scripts.load_test --in-process --endpoint fast-batch --batch-size 64 --qps 50
+
+Results are printed; --json writes them as JSON ("-" for stdout).
 """
 
-import requests
-import numpy as np
+import argparse
+import asyncio
+import json
+import sqlite3
+import sys
 import time
 import uuid
+from collections import Counter
+from contextlib import nullcontext
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+from monitoring.db import DB_PATH
+
+N_FEATURES = 8
+FEATURES = [f"feature{i}" for i in range(1, N_FEATURES + 1)]
+PERCENTILES = {"p50": 50, "p95": 95, "p99": 99, "p999": 99.9}
+
+
+# ---------- REQUESTS ----------
+def schema_item(row):
+    return dict(zip(FEATURES, row))
+
+
+def build_predict(request_id, rows):
+    return f"/predict/{request_id}", {"json": schema_item(rows[0])}
 
-API_URL = f"http://127.0.0.1:8000/predict/{uuid.uuid1()}"
 
+def build_v2(request_id, rows):
+    return f"/v2/predict/{request_id}", {"json": schema_item(rows[0])}
 
-def generate_sample(shift=False):
+
+def build_batch(request_id, rows):
+    items = [{**schema_item(row), "request_id": f"{request_id}-{i}"} for i, row in enumerate(rows)]
+    return "/predict/batch", {"json": {"items": items}}
+
+
+def build_fast(request_id, rows):
+    return f"/fast/predict/{request_id}", {"json": rows[0]}
+
+
+def build_fast_batch(request_id, rows):
+    body = np.asarray(rows, dtype="<f8").tobytes()
+    return f"/fast/predict/batch/{request_id}", {
+        "content": body,
+        "headers": {"content-type": "application/octet-stream", "accept": "application/octet-stream"},
+    }
+
+
+# name -> (request builder, sends more than one row)
+ENDPOINTS = {
+    "predict": (build_predict, False),
+    "v2": (build_v2, False),
+    "batch": (build_batch, True),
+    "fast": (build_fast, False),
+    "fast-batch": (build_fast_batch, True),
+}
+
+
+def parse_drift(spec: str):
     """
-    Generate a single input sample.
-    If shift=True, distribution is shifted to induce drift.
+    "0:0,0.5:2" -> [(0.0, 0.0), (0.5, 2.0)]: (start fraction of the run, shift).
     """
-    base = np.random.normal(loc=0, scale=1, size=8)
+    steps = []
+    for part in spec.split(","):
+        start, shift = part.split(":")
+        steps.append((float(start), float(shift)))
+    return sorted(steps)
+
 
-    if shift:
-        base += 2.0  
+def shift_at(steps, fraction: float) -> float:
+    shift = 0.0
+    for start, value in steps:
+        if fraction >= start:
+            shift = value
+    return shift
 
-    return base.tolist()
 
+def make_requests(args, run_id, n):
+    """
+    (path, httpx kwargs) for n requests, built before the clock starts.
+    """
+    build, batched = ENDPOINTS[args.endpoint]
+    batch_size = args.batch_size if batched else 1
+    steps = parse_drift(args.drift)
+    rng = np.random.default_rng(args.seed)
 
-def send_requests():
-    for i in range(1000):
-        shift = i >= 500
-        data_points =  generate_sample(shift)
-        payload = {
-            "feature1": data_points[0],
-            "feature2": data_points[1],
-            "feature3": data_points[2],
-            "feature4": data_points[3],
-            "feature5": data_points[4],
-            "feature6": data_points[5],
-            "feature7": data_points[6],
-            "feature8": data_points[7]
-            }
-        response = requests.post(API_URL, json=payload)
+    requests = []
+    for i in range(n):
+        rows = rng.normal(size=(batch_size, N_FEATURES)) + shift_at(steps, i / n)
+        requests.append(build(f"{run_id}-{i}", rows.tolist()))
+    return requests, batch_size
 
-        if response.status_code != 200:
-            print(f"❌ Failed at request {i}")
+
+def arrival_offsets(args) -> np.ndarray:
+    """
+    Send time of each request, in seconds from the start of the run.
+    """
+    if args.arrival == "poisson":
+        rng = np.random.default_rng(args.seed + 1)
+        return np.cumsum(rng.exponential(1 / args.qps, size=args.requests)) - 1 / args.qps
+    return np.arange(args.requests) / args.qps
+
+
+# ---------- RUN ----------
+async def run_load(client, requests, args):
+    """
+    Send all requests; returns (latencies in seconds, status codes, elapsed).
+    Failed connections are recorded with status 0.
+    """
+    latencies = np.full(len(requests), np.nan)
+    statuses = np.zeros(len(requests), dtype=np.int64)
+
+    async def send(i, scheduled):
+        path, kwargs = requests[i]
+        try:
+            response = await client.post(path, **kwargs)
+            statuses[i] = response.status_code
+        except httpx.HTTPError:
+            statuses[i] = 0
+        latencies[i] = time.perf_counter() - scheduled
+
+    start = time.perf_counter()
+    if args.qps > 0:
+        tasks = []
+        for i, offset in enumerate(arrival_offsets(args)):
+            scheduled = start + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(send(i, scheduled)))
+        await asyncio.gather(*tasks)
+    else:
+        next_index = iter(range(len(requests)))
+
+        async def worker():
+            for i in next_index:
+                await send(i, time.perf_counter())
+
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    return latencies, statuses, time.perf_counter() - start
+
+
+def db_last_id(db_path):
+    # The AUTOINCREMENT counter, not COUNT(*) or MAX(id): archiving
+    # deletes rows.
+    if db_path is None or not Path(db_path).exists():
+        return None
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(
+            """
+            SELECT COALESCE(
+                (SELECT seq FROM sqlite_sequence WHERE name = 'predictions'),
+                (SELECT MAX(id) FROM predictions),
+                0
+            )
+            """
+        ).fetchone()[0]
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+
+
+async def watch_db(db_path, seconds, poll=0.1):
+    """
+    Poll the prediction counter for `seconds` while the monitoring queue
+    drains; returns (last value, perf_counter time it was first seen).
+    """
+    last, seen_at = db_last_id(db_path), time.perf_counter()
+    deadline = seen_at + seconds
+    while time.perf_counter() < deadline:
+        await asyncio.sleep(poll)
+        value = db_last_id(db_path)
+        if value != last:
+            last, seen_at = value, time.perf_counter()
+    return last, seen_at
+
+
+def summarize(args, latencies, statuses, elapsed, batch_size, db_rows, db_seconds, monitoring):
+    ok = statuses == 200
+    latency_ms = latencies[ok] * 1e3
+    if len(latency_ms):
+        latency = {name: float(np.percentile(latency_ms, q)) for name, q in PERCENTILES.items()}
+        latency.update(mean=float(latency_ms.mean()), max=float(latency_ms.max()))
+    else:
+        latency = None
+
+    return {
+        "config": {
+            "target": "in-process" if args.in_process else args.url,
+            "endpoint": args.endpoint,
+            "requests": args.requests,
+            "batch_size": batch_size,
+            "qps": args.qps,
+            "arrival": args.arrival if args.qps > 0 else "closed-loop",
+            "concurrency": args.concurrency,
+            "drift": parse_drift(args.drift),
+        },
+        "elapsed_s": elapsed,
+        "ok": int(ok.sum()),
+        "errors": int((~ok).sum()),
+        "status_codes": {str(code): n for code, n in sorted(Counter(statuses.tolist()).items())},
+        "throughput": {
+            "requests_per_s": float(ok.sum() / elapsed),
+            "rows_per_s": float(ok.sum() * batch_size / elapsed),
+            "offered_qps": args.qps or None,
+        },
+        "latency_ms": latency,
+        "db": None if db_rows is None else {
+            "rows_written": db_rows,
+            # From the start of the run until the last new row was seen.
+            "window_s": db_seconds,
+            "rows_per_s": db_rows / db_seconds if db_seconds > 0 else None,
+        },
+        "monitoring": monitoring,
+    }
+
+
+def print_summary(result):
+    config, throughput = result["config"], result["throughput"]
+    print(f"{config['endpoint']} x{config['requests']} (batch {config['batch_size']}, "
+          f"{config['arrival']}) against {config['target']}")
+    print(f"  ok {result['ok']}  errors {result['errors']}  {result['status_codes']}")
+    print(f"  {throughput['requests_per_s']:.1f} req/s, {throughput['rows_per_s']:.1f} rows/s "
+          f"in {result['elapsed_s']:.2f}s")
+    if result["latency_ms"]:
+        print("  latency ms: " + "  ".join(f"{k} {v:.2f}" for k, v in result["latency_ms"].items()))
+    if result["db"]:
+        db = result["db"]
+        rate = "n/a" if db["rows_per_s"] is None else f"{db['rows_per_s']:.1f}"
+        print(f"  db: {db['rows_written']} rows in {db['window_s']:.2f}s, {rate} rows/s")
+
+
+async def main_async(args):
+    run_id = uuid.uuid4().hex[:8]
+    requests, batch_size = make_requests(args, run_id, args.requests)
+    warmup, _ = make_requests(args, f"{run_id}-warmup", args.warmup)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    timeout = httpx.Timeout(args.timeout)
+
+    if args.in_process:
+        from api.main import app
+        transport = httpx.ASGITransport(app=app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://in-process", timeout=timeout)
+        # ASGITransport does not send lifespan events; run them here.
+        lifespan = app.router.lifespan_context(app)
+    else:
+        client = httpx.AsyncClient(base_url=args.url, limits=limits, timeout=timeout)
+        lifespan = nullcontext()
+
+    db_path = None if args.db == "none" else args.db
+    async with lifespan, client:
+        # Untimed: the first requests wait for the model to load.
+        for path, kwargs in warmup:
+            await client.post(path, **kwargs)
+        if warmup:
+            await asyncio.sleep(args.settle)  # keep warmup rows out of the DB count
+
+        before = db_last_id(db_path)
+        start = time.perf_counter()
+        latencies, statuses, elapsed = await run_load(client, requests, args)
+
+        # Let the monitoring queue drain and the batch writer flush.
+        if db_path is None:
+            await asyncio.sleep(args.settle)
+            after, last_write = None, start
         else:
-            print(f"✅ Sent request {i+1}")
+            after, last_write = await watch_db(db_path, args.settle)
+        try:
+            monitoring = (await client.get("/monitoring/stats")).json()
+        except (httpx.HTTPError, ValueError):
+            monitoring = None
+
+    db_rows = None if before is None or after is None else after - before
+    return summarize(args, latencies, statuses, elapsed, batch_size,
+                     db_rows, last_write - start, monitoring)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--in-process", action="store_true", help="run api.main:app in this process")
+    parser.add_argument("--endpoint", choices=list(ENDPOINTS), default="predict")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--duration", type=float, help="with --qps, sets --requests to qps * duration")
+    parser.add_argument("--qps", type=float, default=100.0, help="offered load; 0 for closed-loop")
+    parser.add_argument("--arrival", choices=["uniform", "poisson"], default="poisson")
+    parser.add_argument("--concurrency", type=int, default=64, help="connection pool size / closed-loop workers")
+    parser.add_argument("--batch-size", type=int, default=32, help="rows per request for batch endpoints")
+    parser.add_argument("--drift", default="0:0,0.5:2", help="start_fraction:shift steps")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed requests sent first")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--settle", type=float, default=2.0, help="seconds to wait for DB writes after the run")
+    parser.add_argument("--db", default=str(DB_PATH), help="monitoring.db to count written rows in, or 'none'")
+    parser.add_argument("--json", help="write results as JSON to this path ('-' for stdout)")
+    args = parser.parse_args()
+
+    if args.duration is not None and args.qps > 0:
+        args.requests = max(int(args.qps * args.duration), 1)
 
-        time.sleep(0.1)  
+    result = asyncio.run(main_async(args))
+    if args.json == "-":
+        json.dump(result, sys.stdout, indent=2)
+        print()
+    else:
+        print_summary(result)
+        if args.json:
+            Path(args.json).write_text(json.dumps(result, indent=2))
 
 
 if __name__ == "__main__":
-    send_requests()
+    main()
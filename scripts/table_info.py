@@ -16,14 +16,6 @@ def check_table(table_name: str, limit: int = 5):
     # Show latest rows
     df = pd.read_sql(f"SELECT * FROM {table_name} ORDER BY timestamp DESC LIMIT {limit}", conn)
 
-    # Parse JSON columns if needed
-    if table_name == "predictions" and "features" in df.columns:
-        df["features"] = df["features"].apply(lambda x: x)
-    elif table_name == "metrics":
-        for col in ["mean_drift_vals", "median_drift_vals", "std_drift_vals"]:
-            if col in df.columns:
-                df[col] = df[col].apply(lambda x: x)
-
     print(df)
     print("\n")
     conn.close()